@@ -30,7 +30,7 @@ from bnr.src.operators.parameter_setup import (
     NODE_EDITOR_OP_LoadParameterSetup,
     NODE_EDITOR_OP_LoadDefaultParameters
 )
-from bnr.src.operators.render import NODE_OP_Render
+from bnr.src.operators.render import NODE_OP_Render, NODE_OP_BenchmarkProfiles
 from bnr.src.panels.nodes_panel import NODE_EDITOR_PT_NodesPanel
 from bnr.src.panels.settings_panel import NODE_EDITOR_PT_SettingsPanel
 from bnr.src.properties.properties import (
@@ -54,6 +54,7 @@ panels = (
 
 operators = (
     NODE_OP_Render,
+    NODE_OP_BenchmarkProfiles,
     NODE_EDITOR_OP_LoadNodes,
     NODE_EDITOR_OP_SaveParameterSetup,
     NODE_EDITOR_OP_LoadParameterSetup,
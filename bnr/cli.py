@@ -0,0 +1,100 @@
+"""Headless entry point for rendering datasets without the Node Editor panel.
+
+Run Blender in background mode on the .blend file that contains the material, and pass a JSON job spec after '--':
+
+    blender -b file.blend --python-expr "import bnr.cli; bnr.cli.main()" -- job.json
+
+A job spec looks like this (only 'material' and 'output_dir' are required, see bnr.src.misc.job):
+
+    {
+        "material": "Material",
+        "output_dir": "renders/",
+        "render_amount": 1000,
+        "x_res": 128,
+        "y_res": 128,
+        "parameter_setup": "Material_parameter_setup.json",
+        "workers": 1
+    }
+
+With "workers" > 1 (or --workers), the job is split into disjoint index ranges that are rendered by that many background
+Blender processes, and their outputs are merged into one dataset once all of them are done.
+
+To merge the datasets of several runs of the same material into one (renumbering their samples, see bnr.src.misc.merge):
+
+    blender -b --python-expr "import bnr.cli; bnr.cli.main()" -- --merge merged/ run1/ run2/
+
+With --benchmark, nothing is rendered to the dataset. Instead, a few samples are rendered with every render profile and the
+time per image and pixel error of each profile are reported (see bnr.src.misc.benchmark).
+"""
+import argparse
+import json
+import sys
+
+import bpy
+
+import bnr
+from bnr.src.misc.benchmark import benchmark_profiles
+from bnr.src.misc.job import RenderJob
+from bnr.src.misc.merge import merge_runs
+from bnr.src.misc.pipeline import run_render_job
+from bnr.src.misc.shard import run_sharded_job
+from bnr.src.operators.parameter_setup import load_parameter_setup
+
+
+def script_args(argv=None):
+    """Returns the arguments meant for the script, which Blender expects to be placed after '--'."""
+    argv = sys.argv if argv is None else argv
+    return argv[argv.index("--") + 1:] if "--" in argv else []
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="bnr.cli", description="Render a dataset of node parameter variations headlessly.")
+    parser.add_argument("job", nargs="?", help="Path to a JSON job spec file")
+    parser.add_argument("--workers", type=int, help="Number of background Blender processes to shard the job over (overrides the job spec)")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted job, skipping images that were already rendered")
+    parser.add_argument("--benchmark", action="store_true", help="Benchmark the render profiles on the job instead of rendering it")
+    parser.add_argument("--benchmark-samples", type=int, default=3, help="Number of samples rendered per profile by --benchmark")
+    parser.add_argument("--merge", nargs="+", metavar="DIR", help="Merge the datasets in the given run directories into the first directory instead of rendering")
+    parser.add_argument("--copy", action="store_true", help="Copy the images when merging, instead of hard linking them")
+    args = parser.parse_args(argv)
+    if args.merge is not None and len(args.merge) < 2:
+        parser.error("--merge needs an output directory and at least one run directory")
+    if args.merge is None and args.job is None:
+        parser.error("a job spec is required")
+    return args
+
+
+def ensure_registered():
+    """Registers the addon if it is not already enabled in the preferences of this Blender instance."""
+    if "props" not in bpy.types.Scene.bl_rna.properties:
+        bnr.register()
+
+
+def main(argv=None):
+    args = parse_args(script_args(argv))
+    if args.merge:
+        merge_runs(args.merge[0], args.merge[1:], link=not args.copy)
+        return
+
+    ensure_registered()
+
+    job = RenderJob.from_json(args.job)
+    if args.workers is not None:
+        job.workers = args.workers
+    job.resume = job.resume or args.resume
+    material = bpy.data.materials[job.material_name]
+
+    if job.parameter_setup:
+        with open(job.parameter_setup, "r") as f:
+            load_parameter_setup(json.load(f), material.node_tree.nodes)
+
+    if args.benchmark:
+        benchmark_profiles(job, bpy.context.scene, material, samples=args.benchmark_samples)
+    elif job.workers > 1:
+        run_sharded_job(job, bpy.context.scene, material)
+    else:
+        run_render_job(job, bpy.context.scene, material)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Adaptive sampling: a job with the adaptive strategy renders its samples in rounds. The first round is an ordinary design
+(see bnr.src.misc.samplers), the samples of every later round are placed where the renders of the earlier rounds change the
+most between neighbouring samples, so that regions of the parameter space where the material barely changes get fewer renders.
+
+Renders are compared like in parameter elimination: small thumbnails are projected onto their principal components, and the
+difference of two renders is their norm weighted by the explained variance ratio (see bnr.src.operators.eliminate_parameters).
+The thumbnails are stored with the job's metadata, so that an interrupted job places the same rounds when it is resumed.
+Neighbours are searched by brute force, which is meant for datasets of up to some ten thousand samples.
+"""
+import json
+import os
+
+import numpy as np
+from sklearn.decomposition import PCA
+
+from bnr.src.misc.capture import to_display
+from bnr.src.misc.design import normalize_values, uniform_to_values
+from bnr.src.misc.rng import counter_uniform
+from bnr.src.operators.eliminate_parameters import flatten_image, norm
+
+FEATURES_FILE = "adaptive_features.npy"  # Thumbnails of the rendered samples (NaN if not rendered yet), shape (N, F)
+ADAPTIVE_META_FILE = "adaptive.json"  # The number of rows of the design that have been placed
+ROUNDS = 4  # The samples are split into this many rounds, the first one is the initial design
+THUMBNAIL_SIZE = 16  # Renders are compared at this resolution
+COMPONENTS = 8  # Number of principal components the thumbnails are compared with
+NEIGHBOURS = 4  # Number of rendered neighbours the local change of a sample is estimated from
+CANDIDATES = 8  # Number of random candidates per sample of a round, the best ones are rendered
+EXPLORATION = 0.1  # Weight of the distance to the nearest render alone, so that flat regions are not ignored entirely
+CANDIDATE_STREAM = 3  # Random stream of the candidates (see rng.counter_uniform)
+_CHUNK = 1024  # Number of points whose neighbours are searched at once
+
+
+def _box_mean(a: np.ndarray, n, axis):
+    """Averages an axis of an array down to n evenly sized boxes."""
+    edges = np.linspace(0, a.shape[axis], n + 1).astype(np.int64)
+    shape = [1] * a.ndim
+    shape[axis] = n
+    return np.add.reduceat(a, edges[:-1], axis=axis) / np.maximum(np.diff(edges), 1).reshape(shape)
+
+
+def thumbnail(pixels: np.ndarray) -> np.ndarray:
+    """Returns the display RGB values of a render (see capture.render_to_array), scaled down to THUMBNAIL_SIZE x THUMBNAIL_SIZE
+    and flattened."""
+    small = _box_mean(_box_mean(to_display(pixels)[:, :, :3], THUMBNAIL_SIZE, 0), THUMBNAIL_SIZE, 1)
+    return flatten_image(small)[0]
+
+
+def nearest(points: np.ndarray, queries: np.ndarray, k):
+    """Returns the indices (into points) and euclidean distances of the k nearest points of every query, nearest first."""
+    indices = np.empty((len(queries), k), dtype=np.int64)
+    distances = np.empty((len(queries), k))
+    points_sq = (points ** 2).sum(axis=1)
+
+    for start in range(0, len(queries), _CHUNK):
+        q = queries[start:start + _CHUNK]
+        d = np.maximum((q ** 2).sum(axis=1)[:, None] + points_sq[None, :] - 2 * q @ points.T, 0)
+        part = np.argpartition(d, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(d, part, axis=1), axis=1)
+        indices[start:start + len(q)] = np.take_along_axis(part, order, axis=1)
+        distances[start:start + len(q)] = np.sqrt(np.take_along_axis(d, indices[start:start + len(q)], axis=1))
+
+    return indices, distances
+
+
+def local_change(coords: np.ndarray, pcs: np.ndarray, exp_var_rat: np.ndarray) -> np.ndarray:
+    """Estimates how fast the renders change around every sample: the largest difference (norm of their principal components)
+    to one of its nearest neighbours, divided by their distance in parameter space."""
+    k = min(NEIGHBOURS, len(coords) - 1)
+    if k < 1:
+        return np.ones(len(coords))
+
+    neighbours, distances = nearest(coords, coords, k + 1)
+    neighbours, distances = neighbours[:, 1:], distances[:, 1:]  # The nearest point is the sample itself
+    samples = np.repeat(np.arange(len(coords)), k)
+    change = norm(pcs[samples].T, pcs[neighbours.ravel()].T, exp_var_rat[:, None]).reshape(-1, k)
+
+    return np.max(change / np.maximum(distances, 1e-9), axis=1)
+
+
+class AdaptiveDesign:
+    """Places the rows of the later rounds of an adaptive design (see strategies.AdaptiveStrategy) based on the renders of
+    the earlier rounds, which have to be passed to observe as they are rendered.
+
+    Arguments:
+        design -- The ParameterDesign of the job, which must be writable
+        directory -- The directory the thumbnails and the progress of the design are stored in
+        resume -- If set, the thumbnails and rows placed by an earlier run of the job are kept
+    """
+
+    def __init__(self, design, directory, resume=False):
+        self.design = design
+        self.bounds = np.linspace(0, len(design), ROUNDS + 1).astype(np.int64)
+        self.meta_path = directory + ADAPTIVE_META_FILE
+        features_path = directory + FEATURES_FILE
+
+        if resume and os.path.exists(features_path) and os.path.exists(self.meta_path):
+            self.features = np.load(features_path, mmap_mode="r+")
+            with open(self.meta_path, "r") as f:
+                self.placed = json.load(f)["placed"]
+        else:
+            self.features = np.lib.format.open_memmap(features_path, mode="w+", dtype=np.float32,
+                                                      shape=(len(design), THUMBNAIL_SIZE * THUMBNAIL_SIZE * 3))
+            self.features[:] = np.nan
+            self._set_placed(int(self.bounds[1]))  # The first round is the initial design
+
+    def _set_placed(self, placed):
+        self.placed = placed
+        with open(self.meta_path, "w") as f:
+            json.dump({"placed": placed}, f)
+
+    def observe(self, r, pixels: np.ndarray):
+        """Records the render of sample r."""
+        self.features[r] = thumbnail(pixels)
+
+    def rounds(self, indices):
+        """Yields the given sample indices round by round, keeping their order. The rows of a round are placed right before
+        it is yielded, so all samples of the earlier rounds have to be rendered by then."""
+        for start, stop in zip(self.bounds[:-1].tolist(), self.bounds[1:].tolist()):
+            if stop > self.placed:
+                self.place(start, stop)
+            round_indices = [r for r in indices if start <= r < stop]
+            if round_indices:
+                yield round_indices
+
+    def place(self, start, stop):
+        """Places the rows [start, stop) of the design: random candidates are drawn, and the ones furthest away from the
+        rendered samples are chosen, with distances weighted by how fast the renders change around their nearest sample."""
+        table = self.design.table
+        self.features.flush()
+        observed = np.flatnonzero(~np.isnan(self.features[:start, 0]))
+        u = counter_uniform(self.design.seed, np.arange(start * CANDIDATES, stop * CANDIDATES), len(table), stream=CANDIDATE_STREAM)
+        candidates = uniform_to_values(table, u)
+
+        if len(observed) > 1 and len(table):
+            values = candidates[self.select(observed, candidates, stop - start)]
+        else:
+            values = candidates[:stop - start]
+
+        self.design.values[start:stop] = values
+        self.design.labels[start:stop] = normalize_values(table, values)
+        self.design.values.flush()
+        self.design.labels.flush()
+        self._set_placed(stop)
+
+    def select(self, observed: np.ndarray, candidates: np.ndarray, n) -> list:
+        """Greedily chooses n candidates. After every choice, the distances are updated as if it had been rendered already,
+        so that the chosen samples spread out over the regions of high change instead of piling up."""
+        table = self.design.table
+        coords = np.asarray(self.design.labels[observed], dtype=np.float64)
+        features = np.asarray(self.features[observed])
+
+        pca = PCA(n_components=min(COMPONENTS, len(observed), features.shape[1]))
+        pcs = pca.fit_transform(features)
+        change = np.nan_to_num(local_change(coords, pcs, np.nan_to_num(pca.explained_variance_ratio_)))
+        change = change / max(change.max(), 1e-12)
+
+        candidate_coords = normalize_values(table, candidates)
+        closest, distances = nearest(coords, candidate_coords, 1)
+        weights = change[closest[:, 0]] + EXPLORATION
+        distances = distances[:, 0]
+
+        chosen = []
+        for _ in range(n):
+            c = int(np.argmax(weights * distances))
+            chosen.append(c)
+            distances = np.minimum(distances, np.sqrt(((candidate_coords - candidate_coords[c]) ** 2).sum(axis=1)))
+
+        return chosen
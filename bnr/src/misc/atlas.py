@@ -0,0 +1,151 @@
+import math
+
+import bpy
+import numpy as np
+
+from bnr.src.misc.scene_setup import copy_render_settings, create_plane_mesh, delete_scene, setup_HDRI_for_world, CAMERA_NAME, PLANE_NAME
+
+ATLAS_SCENE_NAME = "RENDER_ATLAS_TMP"
+ATLAS_MATERIAL_NAME = "{} atlas {}"
+
+
+def camera_view(scene, x_res, y_res):
+    """Returns the part of the plane z = 0 that the camera of scene shows in an x_res x y_res render, computed like Blender
+    computes the view plane of a camera (sensor fit, pixel aspect and shift included).
+
+    Returns:
+        (pixel_w, pixel_h, center_x, center_y): the width and height of a pixel on the plane, and the point of the plane in
+        the center of the render
+
+    Raises:
+        ValueError if the camera does not look straight down at the plane, so that an orthographic tile can not show the same
+    """
+    camera = scene.camera
+    cam = camera.data
+    distance = camera.location.z
+    if camera.parent or tuple(camera.rotation_euler) != (0, 0, 0) or distance <= 0 or cam.type not in ("PERSP", "ORTHO"):
+        raise ValueError("Atlas tiles can only match a camera that looks straight down at the plane, which {} does not".format(camera.name))
+
+    render = scene.render
+    y_cor = render.pixel_aspect_y / render.pixel_aspect_x
+    fit = cam.sensor_fit
+    if fit == "AUTO":
+        fit = "HORIZONTAL" if render.pixel_aspect_x * x_res >= render.pixel_aspect_y * y_res else "VERTICAL"
+
+    if cam.type == "ORTHO":
+        size = cam.ortho_scale
+    else:
+        size = (cam.sensor_height if cam.sensor_fit == "VERTICAL" else cam.sensor_width) * distance / cam.lens
+    pixel = size / (x_res if fit == "HORIZONTAL" else y_cor * y_res)
+
+    return pixel, y_cor * pixel, camera.location.x + cam.shift_x * size, camera.location.y + cam.shift_y * size
+
+
+def tile_padding(scene) -> int:
+    """Returns the number of pixels between the tiles of an atlas (on each side), so that no pixel of a tile is filtered
+    or denoised together with pixels of another tile."""
+    width = scene.render.filter_size
+    if scene.render.engine == "CYCLES":
+        width = scene.cycles.filter_width
+        layer = scene.view_layers[0].cycles
+        if layer.use_denoising:
+            width = max(width, 2 * layer.denoising_radius)
+
+    return int(math.ceil(width))
+
+
+class Atlas:
+    """A scene that renders K x K samples at once: a grid of planes, each with its own copy of the material, is viewed from
+    above by an orthographic camera, and every tile of the render is one sample.
+
+    Every tile shows exactly what the camera of the standard scene shows of its plane: the planes are cropped to the view of
+    that camera (keeping their texture coordinates), and the orthographic camera has the same size of a pixel on the plane.
+    Tiles are separated by a few pixels of the plane (see tile_padding), which are cut off again.
+
+    Tile t is in row t // K and column t % K of the image, counting from the top left.
+    """
+
+    def __init__(self, source_scene, material, k, x_res, y_res):
+        """
+        Arguments:
+            source_scene -- The standard scene (see bnr.src.misc.scene_setup) to copy the view and the render settings from
+            material -- The material to render, it is copied once per tile (after parameter elimination, so that the copies
+                        have the same enabled parameters)
+            k -- The number of tiles per row and column
+            x_res, y_res -- The resolution of a single tile
+
+        Raises:
+            ValueError if the tiles can not look like renders of the standard scene, because its camera does not look
+            straight down at the plane or EEVEE's screen space effects would blend neighbouring tiles
+        """
+        eevee = source_scene.eevee
+        if source_scene.render.engine == "BLENDER_EEVEE" and (eevee.use_gtao or eevee.use_ssr or eevee.use_bloom):
+            raise ValueError("Atlas rendering can not be used with EEVEE's ambient occlusion, screen space reflections or bloom, "
+                             "as they blend neighbouring tiles. Turn them off or render every sample on its own.")
+
+        pixel_w, pixel_h, center_x, center_y = camera_view(source_scene, x_res, y_res)
+
+        self.k = k
+        self.x_res = x_res
+        self.y_res = y_res
+        self.padding = tile_padding(source_scene)
+        self.materials = [material.copy() for _ in range(k * k)]
+        for t, m in enumerate(self.materials):
+            m.name = ATLAS_MATERIAL_NAME.format(material.name, t)
+
+        old_scene = bpy.data.scenes.get(ATLAS_SCENE_NAME)
+        if old_scene:
+            delete_scene(old_scene)
+
+        # Every tile covers its render and the padding around it
+        tile_w = (x_res + 2 * self.padding) * pixel_w
+        tile_h = (y_res + 2 * self.padding) * pixel_h
+
+        scene = bpy.data.scenes.new(ATLAS_SCENE_NAME)
+        copy_render_settings(source_scene, scene)
+        scene.render.resolution_x = k * (x_res + 2 * self.padding)
+        scene.render.resolution_y = k * (y_res + 2 * self.padding)
+        scene.render.resolution_percentage = 100
+        self.scene = scene
+
+        crop = (center_x - tile_w / 2, center_y - tile_h / 2, center_x + tile_w / 2, center_y + tile_h / 2)
+        self.planes = []
+        for t, m in enumerate(self.materials):
+            row, col = divmod(t, k)
+            name = "{} {}".format(PLANE_NAME, t)
+            plane = bpy.data.objects.new(name, create_plane_mesh(name, crop=crop))
+            plane.data.materials.append(m)
+            scene.collection.objects.link(plane)
+            # The center of the view lands on the center of the tile
+            plane.location = ((col - (k - 1) / 2) * tile_w - center_x, ((k - 1) / 2 - row) * tile_h - center_y, 0)
+            self.planes.append(plane)
+
+        scene.world = bpy.data.worlds.new(ATLAS_SCENE_NAME)
+        setup_HDRI_for_world(scene.world)
+
+        camera = bpy.data.objects.new(CAMERA_NAME, bpy.data.cameras.new(CAMERA_NAME))
+        camera.data.type = "ORTHO"
+        camera.data.sensor_fit = "HORIZONTAL"
+        camera.data.ortho_scale = k * tile_w
+        camera.location = (0, 0, 2)
+        scene.collection.objects.link(camera)
+        scene.camera = camera
+
+    def __len__(self):
+        return self.k * self.k
+
+    def tile(self, pixels: np.ndarray, t) -> np.ndarray:
+        """Returns the pixels of tile t of a captured atlas render (see bnr.src.misc.capture.render_to_array)."""
+        row, col = divmod(t, self.k)
+        top = row * (self.y_res + 2 * self.padding) + self.padding
+        left = col * (self.x_res + 2 * self.padding) + self.padding
+        tile = pixels[top:top + self.y_res, left:left + self.x_res]
+        return np.ascontiguousarray(tile)  # Tiles are encoded in the background, so don't keep a view of the whole atlas
+
+    def remove(self):
+        """Deletes the atlas scene and the material copies."""
+        delete_scene(self.scene)
+        for m in self.materials:
+            bpy.data.materials.remove(m)
+        self.materials = []
+        self.planes = []
@@ -0,0 +1,92 @@
+import os
+
+import bpy
+import numpy as np
+from bpy import ops
+
+BATCH_DIR = "batch"  # Directory in the metadata dir that the frames of a batch are rendered to
+ACTION_NAME = "BNR Batch"
+
+
+class KeyframeBatch:
+    """Keyframes blocks of design rows onto the bound sockets of a material, one sample per frame, so that a whole block can
+    be rendered with a single animation render instead of one render call per sample.
+
+    Keyframes are written with foreach_set directly into new F-Curves (one per changing socket channel). Samples are only
+    ever evaluated at their own frame, where the F-Curve passes exactly through the keyframe, so interpolation does not matter.
+    """
+
+    def __init__(self, plan, node_tree):
+        """
+        Arguments:
+            plan -- The BindingPlan of the job (see bnr.src.misc.binding)
+            node_tree -- The node tree of the material, which the keyframes are added to
+        """
+        self.plan = plan
+        self.anim = node_tree.animation_data or node_tree.animation_data_create()
+        self.previous_action = self.anim.action
+        self.action = None
+
+    def bake(self, rows: np.ndarray):
+        """Replaces the keyframes with those of a block of design rows, row k is keyframed onto frame k + 1."""
+        self._remove_action()
+        self.action = bpy.data.actions.new(ACTION_NAME)
+
+        n = len(rows)
+        co = np.empty(2 * n, dtype=np.float32)
+        co[0::2] = np.arange(1, n + 1)
+        for b in self.plan.bindings:
+            for index, values in b.channels(rows):
+                fcurve = self.action.fcurves.new(b.data_path, index=index)
+                fcurve.keyframe_points.add(n)
+                co[1::2] = values
+                fcurve.keyframe_points.foreach_set("co", co)
+                fcurve.update()
+
+        self.anim.action = self.action
+
+    def _remove_action(self):
+        if self.action:
+            self.anim.action = None
+            bpy.data.actions.remove(self.action)
+            self.action = None
+
+    def clear(self):
+        """Removes the keyframes again and restores the animation the material had before."""
+        self._remove_action()
+        self.anim.action = self.previous_action
+
+
+def render_batch(scene, n, directory):
+    """Renders frames 1 to n of scene with a single animation render into directory. The frame range and output path of the
+    scene are restored afterwards.
+
+    Returns:
+        The file paths of the rendered frames, in frame order
+    """
+    render = scene.render
+    old_settings = (scene.frame_start, scene.frame_end, scene.frame_step, scene.frame_current, render.filepath)
+    try:
+        scene.frame_start = 1
+        scene.frame_end = n
+        scene.frame_step = 1
+        render.filepath = directory  # Blender appends the frame number and extension to the path
+        ops.render.render(animation=True, scene=scene.name)
+        return [render.frame_path(frame=f) for f in range(1, n + 1)]
+    finally:
+        scene.frame_start, scene.frame_end, scene.frame_step, frame_current, render.filepath = old_settings
+        scene.frame_set(frame_current)
+
+
+def batches(indices: list, batch_size):
+    """Splits a list of sample indices into consecutive batches of at most batch_size indices."""
+    for start in range(0, len(indices), batch_size):
+        yield indices[start:start + batch_size]
+
+
+def remove_batch_dir(directory):
+    """Removes the batch directory if all frames have been moved out of it."""
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from bnr.src.misc.binding import BindingPlan
+from bnr.src.misc.capture import setup_capture, remove_capture, render_to_array, to_display
+from bnr.src.misc.design import ParameterTable
+from bnr.src.misc.job import RenderJob
+from bnr.src.misc.profiles import PROFILE_ORDER, apply_profile
+from bnr.src.misc.scene_setup import get_standard_scene, get_render_settings, set_render_settings
+from bnr.src.misc.strategies import make_strategy
+from bnr.src.misc.to_json import node_params_min_max_to_json
+
+BENCHMARK_FILE = "profile_benchmark.json"
+
+KEY_PROFILE = "profile"
+KEY_SECONDS_PER_IMAGE = "seconds_per_image"
+KEY_RMSE = "rmse"
+
+
+def benchmark_profiles(job: RenderJob, source_scene, material, profiles=PROFILE_ORDER, samples=3) -> list:
+    """Renders the first samples of a job (as produced by its strategy and sampler) with every profile and measures the
+    render time per image and the error of the pixels compared to the renders of the last (highest quality) profile.
+    The material and, without the standard setup, the render settings and compositor of the source scene are restored
+    afterwards.
+
+    Every profile first renders one sample that is not timed, so that compiling shaders and loading images is not counted.
+    The error is the root mean square difference of the display (sRGB) values, in range [0,1].
+
+    Returns:
+        A list with one dictionary per profile (in the order of profiles), which is also saved to BENCHMARK_FILE in the
+        output directory of the job
+    """
+    scene = get_standard_scene(source_scene, material) if job.use_standard_setup else source_scene
+    settings = get_render_settings(scene)
+    render = scene.render
+    render.resolution_x = job.x_res
+    render.resolution_y = job.y_res
+    render.resolution_percentage = 100
+
+    nodes = material.node_tree.nodes
+    table = ParameterTable(node_params_min_max_to_json(nodes))
+    plan = BindingPlan(nodes, table)
+    defaults = plan.defaults()
+    strategy = make_strategy(job.strategy, table, defaults, job.render_amount, job.seed, sampler=job.sampler,
+                             grid_levels=job.grid_levels)
+    rows = strategy.rows(np.arange(min(samples, strategy.count())))
+
+    images = {}
+    times = {}
+    capture_state = setup_capture(scene)
+    try:
+        for name in profiles:
+            apply_profile(scene, name)
+            plan.apply(rows[0])
+            render_to_array(scene)  # Warm up
+
+            images[name] = []
+            start = time.time()
+            for row in rows:
+                plan.apply(row)
+                images[name].append(to_display(render_to_array(scene)))
+            times[name] = (time.time() - start) / len(rows)
+    finally:
+        plan.apply(defaults)
+        remove_capture(scene, capture_state)
+        set_render_settings(scene, settings)
+
+    reference = images[profiles[-1]]
+    results = []
+    for name in profiles:
+        rmse = float(np.sqrt(np.mean([np.mean((a - b) ** 2) for a, b in zip(images[name], reference)])))
+        results.append({KEY_PROFILE: name, KEY_SECONDS_PER_IMAGE: times[name], KEY_RMSE: rmse})
+        sys.stdout.write("{:<10} {:.3f}s/image  RMSE vs {}: {:.4f}\n".format(name, times[name], profiles[-1], rmse))
+
+    os.makedirs(job.output_dir, exist_ok=True)
+    with open(job.output_dir + BENCHMARK_FILE, "w") as f:
+        json.dump(results, f, indent=4)
+
+    return results
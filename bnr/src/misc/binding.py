@@ -0,0 +1,157 @@
+import numpy as np
+from mathutils import Color
+
+from bnr.src.misc.color import hsv_to_rgb
+from bnr.src.misc.parameters import find_socket_by_id
+from bnr.src.misc.to_json import node_values_to_json
+
+# Kinds of bound sockets, decide how the columns of a design row are written to the socket
+KIND_VALUE = 0
+KIND_INT = 1
+KIND_VECTOR = 2
+KIND_COLOR = 3
+
+_KINDS = {"VALUE": KIND_VALUE, "INT": KIND_INT, "VECTOR": KIND_VECTOR, "RGBA": KIND_COLOR}
+
+
+class Binding:
+    """A single enabled socket and the design matrix columns that are written to it."""
+
+    __slots__ = ("node_name", "identifier", "socket", "kind", "columns", "i_subs", "base", "data_path")
+
+    def __init__(self, node_name, identifier, socket, kind, columns, i_subs, base):
+        """
+        Arguments:
+            base -- The JSON value of the socket when the plan was built (see input_value_to_json), channels that are not
+                    sampled keep this value. Colors are in HSV.
+        """
+        self.node_name = node_name
+        self.identifier = identifier
+        self.socket = socket
+        self.kind = kind
+        self.columns = np.array(columns, dtype=np.int64)
+        self.i_subs = np.array(i_subs, dtype=np.int64)
+        self.base = base
+        self.data_path = socket.path_from_id("default_value")  # Relative to the node tree, for keyframing
+
+    def to_json(self, values):
+        """Returns the JSON value of the socket for the sampled values of its columns."""
+        if self.kind in (KIND_COLOR, KIND_VECTOR):
+            val = list(self.base)
+            for i_sub, v in zip(self.i_subs, values):
+                val[i_sub] = float(v)
+            return val
+        elif self.kind == KIND_INT:
+            return int(values[0])
+        else:
+            return float(values[0])
+
+    def apply(self, values):
+        """Sets the socket to the sampled values of its columns."""
+        if self.kind == KIND_COLOR:
+            c = Color()  # A single color, the array conversion only pays off for many (see BindingPlan.apply)
+            c.hsv = self.to_json(values)
+            self.socket.default_value = [*c[:], 1.0]
+        elif self.kind == KIND_VECTOR:
+            for i_sub, v in zip(self.i_subs, values):
+                self.socket.default_value[i_sub] = v
+        elif self.kind == KIND_INT:
+            self.socket.default_value = int(values[0])
+        else:
+            self.socket.default_value = values[0]
+
+    def channels(self, rows: np.ndarray):
+        """Returns the values of the socket's default_value for every row of a block of design rows, as a list of
+        (array index, values) pairs with one pair per channel that changes (array index is 0 for single value sockets)."""
+        values = rows[:, self.columns]
+        if self.kind == KIND_COLOR:
+            hsv = np.tile(np.array(self.base[:3], dtype=np.float64), (len(rows), 1))
+            hsv[:, self.i_subs] = values
+            rgb = hsv_to_rgb(hsv)
+            return [(c, rgb[:, c]) for c in range(3)]
+        elif self.kind == KIND_VECTOR:
+            return [(int(i_sub), values[:, k]) for k, i_sub in enumerate(self.i_subs)]
+        elif self.kind == KIND_INT:
+            return [(0, np.floor(values[:, 0]))]
+        else:
+            return [(0, values[:, 0])]
+
+
+class BindingPlan:
+    """Compiled mapping from the columns of a design matrix to the sockets of a material, built once at the start of a job.
+
+    Resolving sockets and checking which nodes, inputs and channels are enabled is done only once, as is reading the values of
+    all sockets that are never varied. Applying a sample then only touches the P enabled sockets instead of every input of every node.
+    """
+
+    def __init__(self, nodes, table):
+        """
+        Arguments:
+            nodes -- The nodes of the material
+            table -- The ParameterTable of the enabled parameters (see bnr.src.misc.design), columns of the same
+                     input are adjacent
+        """
+        self.table = table
+
+        # Snapshot of the static values, the bound entries are overwritten for every sample
+        self.static_values = node_values_to_json(nodes)
+
+        self.bindings = []
+        p = 0
+        while p < len(table):
+            param = table.params[p]
+            columns = [p]
+            while p + len(columns) < len(table) and table.params[p + len(columns)]["node_name"] == param["node_name"] \
+                    and table.params[p + len(columns)]["identifier"] == param["identifier"]:
+                columns.append(p + len(columns))
+
+            socket = find_socket_by_id(nodes[param["node_name"]].inputs, param["identifier"])
+            base = self.static_values[param["node_name"]][param["identifier"]]
+            self.bindings.append(Binding(param["node_name"], param["identifier"], socket, _KINDS.get(param["type"], KIND_VALUE),
+                                         columns, table.i_subs[columns], base))
+            p += len(columns)
+
+        self._bound_nodes = {b.node_name for b in self.bindings}
+
+        # Colors are converted from HSV to RGB all at once: the HSV values of all color sockets form one array, whose sampled
+        # entries are overwritten for every sample
+        self._others = [b for b in self.bindings if b.kind != KIND_COLOR]
+        self._colors = [b for b in self.bindings if b.kind == KIND_COLOR]
+        self._color_hsv = np.array([b.base[:3] for b in self._colors], dtype=np.float64).reshape(-1, 3)
+        self._color_rows = np.concatenate([[k] * len(b.columns) for k, b in enumerate(self._colors)] + [[]]).astype(np.int64)
+        self._color_i_subs = np.concatenate([b.i_subs for b in self._colors] + [[]]).astype(np.int64)
+        self._color_columns = np.concatenate([b.columns for b in self._colors] + [[]]).astype(np.int64)
+
+    def __len__(self):
+        return len(self.bindings)
+
+    def defaults(self) -> np.ndarray:
+        """Returns the values the bound sockets had when the plan was built, as a design row (colors in HSV)."""
+        row = np.empty(len(self.table))
+        for b in self.bindings:
+            for col, i_sub in zip(b.columns, b.i_subs):
+                row[col] = b.base[i_sub] if b.kind in (KIND_COLOR, KIND_VECTOR) else b.base
+        return row
+
+    def apply(self, row: np.ndarray):
+        """Sets the bound sockets to the parameter values of a design row."""
+        for b in self._others:
+            b.apply(row[b.columns])
+
+        if self._colors:
+            hsv = self._color_hsv.copy()
+            hsv[self._color_rows, self._color_i_subs] = row[self._color_columns]
+            for b, rgb in zip(self._colors, hsv_to_rgb(hsv).tolist()):
+                b.socket.default_value = [*rgb, 1.0]
+
+    def values_to_json(self, row: np.ndarray) -> dict:
+        """Returns the values of all inputs for a design row, in the same format as node_values_to_json, by combining the
+        static snapshot with the sampled values. The sockets are not read, so this also works for rows that are only keyframed.
+        Only the dictionaries of nodes with bound sockets are copied, the others are shared between samples and must not be modified."""
+        params = dict(self.static_values)
+        for name in self._bound_nodes:
+            params[name] = dict(params[name])
+        for b in self.bindings:
+            params[b.node_name][b.identifier] = b.to_json(row[b.columns])
+
+        return params
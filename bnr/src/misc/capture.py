@@ -0,0 +1,112 @@
+import bpy
+import numpy as np
+from bpy import ops
+from PIL import Image
+
+VIEWER_IMAGE = "Viewer Node"
+CAPTURE_NODE_NAME = "BNR Capture"
+PIL_MODES = {"BW": "L", "RGB": "RGB", "RGBA": "RGBA"}
+
+
+def setup_capture(scene):
+    """Links the render result to a compositor Viewer node, so that the pixels of every render end up in the 'Viewer Node'
+    image, from where they can be read without writing a file. The Viewer node does not change the composite output.
+
+    Returns:
+        The previous compositor state of the scene, pass it to remove_capture to restore it once capturing is done
+    """
+    state = {"use_nodes": scene.use_nodes, "use_compositing": scene.render.use_compositing, "added": []}
+    scene.use_nodes = True
+    scene.render.use_compositing = True
+    nodes = scene.node_tree.nodes
+    links = scene.node_tree.links
+    state["active"] = nodes.active.name if nodes.active else None
+
+    render_layers = next((n for n in nodes if n.type == "R_LAYERS"), None)
+    if render_layers is None:
+        render_layers = nodes.new(type="CompositorNodeRLayers")
+        state["added"].append(render_layers.name)
+
+    viewer = nodes.get(CAPTURE_NODE_NAME)
+    if viewer is None:
+        viewer = nodes.new(type="CompositorNodeViewer")
+        viewer.name = CAPTURE_NODE_NAME
+        viewer.location = (render_layers.location.x + 300, render_layers.location.y - 300)
+        state["added"].append(viewer.name)
+
+    viewer.use_alpha = True
+    links.new(viewer.inputs["Image"], render_layers.outputs["Image"])
+
+    # The compositor only fills the active viewer
+    nodes.active = viewer
+    return state
+
+
+def remove_capture(scene, state: dict):
+    """Restores the compositor of a scene to the state returned by setup_capture: the nodes it added are removed, and the
+    active node and whether the scene uses nodes and compositing are reset."""
+    nodes = scene.node_tree.nodes
+    for name in state["added"]:
+        node = nodes.get(name)
+        if node is not None:
+            nodes.remove(node)
+
+    nodes.active = nodes.get(state["active"]) if state["active"] else None
+    scene.use_nodes = state["use_nodes"]
+    scene.render.use_compositing = state["use_compositing"]
+
+
+def check_display_settings(scene):
+    """Makes sure that captured pixels converted with to_display look like the images Blender writes for the scene.
+
+    Raises:
+        ValueError if the color management of the scene is not the plain 'Standard' view transform
+    """
+    view = scene.view_settings
+    if view.view_transform != "Standard" or view.look != "None" or view.exposure != 0 or view.gamma != 1:
+        raise ValueError(
+            "Captured renders are converted with the 'Standard' view transform, but scene {} uses '{}' (look '{}', exposure "
+            "{}, gamma {}). Select a render profile other than Default, or set the view transform to Standard.".format(
+                scene.name, view.view_transform, view.look, view.exposure, view.gamma))
+
+
+def render_to_array(scene) -> np.ndarray:
+    """Renders the scene and returns the render result as a float32 array of shape (height, width, 4) in scene linear RGBA,
+    with the first row being the top of the image. setup_capture must have been called for the scene.
+    """
+    ops.render.render(write_still=False, scene=scene.name)
+
+    image = bpy.data.images[VIEWER_IMAGE]
+    w, h = image.size
+    if w * h == 0:
+        raise RuntimeError("The render result could not be captured, was setup_capture called for scene {}?".format(scene.name))
+
+    pixels = np.empty(w * h * 4, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+
+    return np.flipud(pixels.reshape(h, w, 4))  # Blender stores images bottom row first
+
+
+def to_display(pixels: np.ndarray) -> np.ndarray:
+    """Converts scene linear pixels to display (sRGB) values in range [0,1]. This matches the 'Standard' view transform
+    (see check_display_settings), the alpha channel is left linear."""
+    rgb = np.clip(pixels[..., :3], 0, 1)
+    rgb = np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * np.power(rgb, 1 / 2.4) - 0.055)
+    if pixels.shape[-1] == 4:
+        return np.concatenate((rgb, np.clip(pixels[..., 3:], 0, 1)), axis=-1)
+
+    return rgb
+
+
+def to_uint8(pixels: np.ndarray) -> np.ndarray:
+    """Converts scene linear pixels to 8 bit display values."""
+    return np.round(to_display(pixels) * 255).astype(np.uint8)
+
+
+def write_image(filepath, pixels: np.ndarray, color_mode="RGBA"):
+    """Encodes captured pixels to an image file, the format is chosen based on the file extension.
+
+    Arguments:
+        color_mode -- One of Blender's image color modes ('BW', 'RGB' or 'RGBA')
+    """
+    Image.fromarray(to_uint8(pixels), mode="RGBA").convert(PIL_MODES[color_mode]).save(filepath)
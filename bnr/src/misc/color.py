@@ -0,0 +1,48 @@
+"""Vectorized color math. Color parameters are sampled in HSV, these functions process whole arrays of colors at once instead of
+going through one mathutils.Color per channel and sample."""
+import numpy as np
+
+from bnr.src.misc.rng import norm_ppf
+
+
+def wrap_hue(h):
+    """Wraps hues (or arrays of hues) into range [0,1): the overflow of values larger than 1 is added to zero, and the overflow
+    of values less than zero is subtracted from 1, so that hues around 0 or 1 stay well centered (1.5 -> 0.5, -0.3 -> 0.7)."""
+    return np.mod(h, 1.0)
+
+
+def normal_hue(mu, sigma, u: np.ndarray) -> np.ndarray:
+    """Transforms uniform numbers in (0,1) to hues drawn from a normal distribution with mean mu and standard deviation
+    sigma, wrapped around into [0,1) (see wrap_hue)."""
+    return wrap_hue(mu + sigma * norm_ppf(u))
+
+
+def hsv_to_rgb(hsv: np.ndarray) -> np.ndarray:
+    """Vectorized version of mathutils.Color.hsv -> rgb, for an array of shape (..., 3)."""
+    hsv = np.asarray(hsv, dtype=np.float64)
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    h6 = wrap_hue(h) * 6
+    i = np.floor(h6).astype(np.int64) % 6
+    f = h6 - np.floor(h6)
+    p = v * (1 - s)
+    q = v * (1 - s * f)
+    t = v * (1 - s * (1 - f))
+
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    return np.stack([r, g, b], axis=-1)
+
+
+def rgb_to_hsv(rgb: np.ndarray) -> np.ndarray:
+    """Vectorized version of mathutils.Color.rgb -> hsv, for an array of shape (..., 3). Grays have hue and saturation 0."""
+    rgb = np.asarray(rgb, dtype=np.float64)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    v = np.max(rgb, axis=-1)
+    chroma = v - np.min(rgb, axis=-1)
+    safe_chroma = np.where(chroma > 0, chroma, 1)
+
+    h = np.where(v == r, (g - b) / safe_chroma, np.where(v == g, 2 + (b - r) / safe_chroma, 4 + (r - g) / safe_chroma))
+    h = np.where(chroma > 0, wrap_hue(h / 6), 0)
+    s = np.where(v > 0, chroma / np.where(v > 0, v, 1), 0)
+    return np.stack([h, s, v], axis=-1)
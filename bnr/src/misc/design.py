@@ -0,0 +1,164 @@
+import json
+import os
+
+import numpy as np
+
+from bnr.src.misc.color import normal_hue
+from bnr.src.misc.misc import normalize
+from bnr.src.misc.samplers import SAMPLER_RANDOM
+from bnr.src.misc.to_json import KEY_MAX, KEY_MIN, KEY_SUB_INDEX
+
+DESIGN_FILE = "design.npy"  # Raw parameter values, shape (N, P)
+DESIGN_LABELS_FILE = "design_labels.npy"  # Normalized labels in range [-1,1], shape (N, P)
+DESIGN_META_FILE = "design.json"  # The seed, strategy, sampler and size of the design
+CHUNK_SIZE = 1 << 16  # Number of rows that are generated at once
+
+
+class ParameterTable:
+    """Column oriented view of the enabled parameter table from node_params_min_max_to_json, with one entry per column of
+    the design matrix (vector and color inputs have one column per enabled channel)."""
+
+    def __init__(self, min_max: dict):
+        params = [min_max[p] for p in sorted(min_max, key=int)]
+        self.params = params
+        self.types = [p["type"] for p in params]
+        self.i_subs = np.array([p[KEY_SUB_INDEX] for p in params], dtype=np.int64)
+        self.mins = np.array([p[KEY_MIN] for p in params], dtype=np.float64)
+        self.maxs = np.array([p[KEY_MAX] for p in params], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.params)
+
+    def is_hue(self, p):
+        """The hue of a color is sampled from a normal distribution, with user_min as mean and user_max as standard deviation."""
+        return self.types[p] == "RGBA" and self.i_subs[p] == 0
+
+
+def uniform_to_values(table: ParameterTable, u: np.ndarray) -> np.ndarray:
+    """Transforms rows of uniform numbers in (0,1) to parameter values, one column per parameter, with the same distributions
+    as set_random_value_for_input. Each column is transformed with the inverse CDF of its distribution, which keeps the even
+    coverage of quasi-random samplers (see bnr.src.misc.samplers)."""
+    values = np.empty_like(u)
+
+    for p in range(len(table)):
+        umin, umax = table.mins[p], table.maxs[p]
+        if table.is_hue(p):
+            values[:, p] = normal_hue(umin, umax, u[:, p])
+        elif table.types[p] == "INT":
+            values[:, p] = np.minimum(np.floor(umin + u[:, p] * (umax - umin + 1)), umax)
+        else:
+            values[:, p] = umin + u[:, p] * (umax - umin)
+
+    return values
+
+
+def normalize_values(table: ParameterTable, values: np.ndarray) -> np.ndarray:
+    """Normalizes a matrix of parameter values to range [-1,1] column-wise (see misc.normalize)."""
+    return normalize(values, table.mins, table.maxs)
+
+
+def write_design_meta(strategy, directory):
+    """Writes the seed, strategy, sampler and size of the design of a strategy to design.json."""
+    with open(directory + DESIGN_META_FILE, "w") as f:
+        json.dump({"seed": strategy.seed, "strategy": strategy.name, "sampler": strategy.sampler, "samples": strategy.count(),
+                   "parameters": len(strategy.table)}, f)
+
+
+class ParameterDesign:
+    """The full N x P design matrix of a job (raw parameter values and normalized labels), generated up front and stored
+    alongside the dataset. Rendering sample r is then just a matter of applying row r to the nodes
+    (see bnr.src.misc.binding.BindingPlan)."""
+
+    levels = None  # Only set for grid designs (see GridDesign)
+
+    def __init__(self, table: ParameterTable, values: np.ndarray, labels: np.ndarray, seed: int, sampler=SAMPLER_RANDOM,
+                 strategy=None):
+        self.table = table
+        self.values = values
+        self.labels = labels
+        self.seed = seed
+        self.sampler = sampler
+        self.strategy = strategy
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def generate(cls, strategy, directory):
+        """Generates the design of a strategy (see bnr.src.misc.strategies) and saves it to directory. Rows are generated in
+        chunks directly into the (memory mapped) files, so memory use does not depend on the number of samples."""
+        table = strategy.table
+        n = strategy.count()
+        values = np.lib.format.open_memmap(directory + DESIGN_FILE, mode="w+", dtype=np.float64, shape=(n, len(table)))
+        labels = np.lib.format.open_memmap(directory + DESIGN_LABELS_FILE, mode="w+", dtype=np.float32, shape=(n, len(table)))
+
+        for start in range(0, n, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, n)
+            values[start:stop] = strategy.rows(np.arange(start, stop))
+            labels[start:stop] = normalize_values(table, values[start:stop])
+
+        values.flush()
+        labels.flush()
+        write_design_meta(strategy, directory)
+
+        return cls(table, values, labels, strategy.seed, strategy.sampler, strategy.name)
+
+    @classmethod
+    def load(cls, table: ParameterTable, directory, mode="r"):
+        """Loads a design saved in directory (memory mapped, read only unless mode is "r+").
+
+        Raises:
+            ValueError if the design does not have one column per parameter of table
+        """
+        values = np.load(directory + DESIGN_FILE, mmap_mode=mode)
+        labels = np.load(directory + DESIGN_LABELS_FILE, mmap_mode=mode)
+        if values.shape[1] != len(table):
+            raise ValueError("The design in {} has {} parameters, but {} are enabled!".format(directory, values.shape[1], len(table)))
+
+        with open(directory + DESIGN_META_FILE, "r") as f:
+            meta = json.load(f)
+
+        return cls(table, values, labels, meta["seed"], meta.get("sampler", SAMPLER_RANDOM), meta.get("strategy"))
+
+    @staticmethod
+    def exists(directory):
+        return all(os.path.exists(directory + f) for f in (DESIGN_FILE, DESIGN_LABELS_FILE, DESIGN_META_FILE))
+
+
+
+class _Rows:
+    """Read only, array like rows that are computed from their sample indices when they are indexed."""
+
+    def __init__(self, compute, n):
+        self._compute = compute
+        self._n = n
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._compute(np.arange(*key.indices(self._n)))
+        if np.ndim(key) == 0:
+            return self._compute(np.array([key], dtype=np.int64))[0]
+
+        return self._compute(np.asarray(key, dtype=np.int64))
+
+
+class GridDesign:
+    """The design of the grid strategy (see bnr.src.misc.strategies.GridStrategy), which is never stored: a grid has the
+    product of the levels of all parameters as samples, far more than could be written up front, but every row is cheaply
+    decoded from its sample index. Rows are computed when they are indexed, otherwise this behaves like a ParameterDesign."""
+
+    def __init__(self, strategy):
+        self.table = strategy.table
+        self.levels = strategy.levels
+        self.seed = strategy.seed
+        self.sampler = strategy.sampler
+        self.strategy = strategy.name
+        n = strategy.count()
+        self.values = _Rows(strategy.rows, n)
+        self.labels = _Rows(lambda indices: normalize_values(self.table, strategy.rows(indices)).astype(np.float32), n)
+
+    def __len__(self):
+        return len(self.values)
@@ -0,0 +1,129 @@
+import hashlib
+import io
+import queue
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from bnr.src.misc.capture import to_uint8, PIL_MODES
+
+# Image format -> file extension
+IMAGE_FORMATS = {
+    "PNG": ".png",
+    "WEBP": ".webp",  # Lossless WebP
+    "NPY": ".npy",  # Raw float32 scene linear pixels
+}
+
+
+def encode_image(pixels: np.ndarray, image_format="PNG", color_mode="RGBA") -> bytes:
+    """Encodes captured pixels (see bnr.src.misc.capture.render_to_array) to the bytes of an image file."""
+    buf = io.BytesIO()
+    if image_format == "NPY":
+        np.save(buf, np.ascontiguousarray(pixels))
+    else:
+        img = Image.fromarray(to_uint8(pixels), mode="RGBA").convert(PIL_MODES[color_mode])
+        if image_format == "WEBP":
+            img.save(buf, "WEBP", lossless=True)
+        else:
+            img.save(buf, "PNG")
+
+    return buf.getvalue()
+
+
+class DirectoryStore:
+    """Writes every encoded image to its own file, named by sample index."""
+
+    def __init__(self, output_dir, extension):
+        self.output_dir = output_dir
+        self.extension = extension
+
+    def filepath(self, index):
+        return "{}{}{}".format(self.output_dir, index, self.extension)
+
+    def put(self, index, data: bytes, records=None):
+        """Writes the image and returns its location. Records are not stored, they end up in the parameter data and label
+        files of the dataset."""
+        path = self.filepath(index)
+        with open(path, "wb") as f:
+            f.write(data)
+
+        return path
+
+    def close(self):
+        pass  # Every image is written to its own complete file
+
+
+class EncoderPool:
+    """Encodes and writes captured renders on a pool of background threads, so that the next sample can be rendered while
+    the previous one is being compressed.
+
+    The queue of pending images is bounded: submit blocks while max_queued images are waiting, which caps the memory used by
+    queued pixel buffers. Completion callbacks are called from the encoder threads, one at a time.
+    """
+
+    _STOP = object()
+
+    def __init__(self, store, image_format="PNG", color_mode="RGBA", threads=2, max_queued=8):
+        self.store = store
+        self.image_format = image_format
+        self.color_mode = color_mode
+        self.encode_time = 0.0  # Summed over all threads
+        self.write_time = 0.0  # Summed over all threads
+        self.wait_time = 0.0  # Time submit spent blocked, because the queue was full
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._error = None
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(max(1, threads))]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, index, pixels: np.ndarray, on_done=None, records=None):
+        """Queues an image for encoding.
+
+        Arguments:
+            on_done -- If set, called as on_done(location, checksum) once the image has been written, where checksum is the
+                       SHA-1 hex digest of the written file
+            records -- Passed on to the store along with the image (see TarShardStore.put)
+        """
+        self._raise_error()
+        start = time.time()
+        self._queue.put((index, pixels, on_done, records))
+        self.wait_time += time.time() - start
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is self._STOP:
+                return
+
+            index, pixels, on_done, records = task
+            try:
+                start = time.time()
+                data = encode_image(pixels, self.image_format, self.color_mode)
+                encoded = time.time()
+                location = self.store.put(index, data, records)
+                written = time.time()
+
+                with self._lock:
+                    self.encode_time += encoded - start
+                    self.write_time += written - encoded
+                    if on_done:
+                        on_done(location, hashlib.sha1(data).hexdigest())
+            except Exception as e:
+                with self._lock:
+                    self._error = self._error or e
+
+    def _raise_error(self):
+        if self._error:
+            raise self._error
+
+    def close(self):
+        """Waits for all queued images to be written and stops the threads. Raises the first error that occurred."""
+        for _ in self._threads:
+            self._queue.put(self._STOP)
+        for t in self._threads:
+            t.join()
+
+        self._raise_error()
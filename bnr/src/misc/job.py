@@ -0,0 +1,274 @@
+import json
+import os
+
+from bnr.src.misc.profiles import PROFILE_DEFAULT
+from bnr.src.misc.rng import new_seed
+from bnr.src.misc.samplers import SAMPLER_RANDOM
+
+# Keys of a JSON job spec file
+KEY_MATERIAL = "material"
+KEY_RENDER_AMOUNT = "render_amount"
+KEY_X_RES = "x_res"
+KEY_Y_RES = "y_res"
+KEY_OUTPUT_DIR = "output_dir"
+KEY_PARAMETER_SETUP = "parameter_setup"
+KEY_USE_STANDARD_SETUP = "use_standard_setup"
+KEY_ELIMINATE_PARAMETERS = "eliminate_parameters"
+KEY_WORKERS = "workers"
+KEY_START_INDEX = "start_index"
+KEY_END_INDEX = "end_index"
+KEY_WORKER_ID = "worker_id"
+KEY_RESUME = "resume"
+KEY_PARAM_FORMAT = "param_format"
+KEY_CAPTURE = "capture"
+KEY_WRITE_IMAGES = "write_images"
+KEY_IMAGE_FORMAT = "image_format"
+KEY_ENCODER_THREADS = "encoder_threads"
+KEY_ENCODER_QUEUE = "encoder_queue"
+KEY_SEED = "seed"
+KEY_BATCH_SIZE = "batch_size"
+KEY_ATLAS = "atlas"
+KEY_REORDER = "reorder"
+KEY_PROFILE = "profile"
+KEY_CACHE = "cache"
+KEY_CACHE_DIR = "cache_dir"
+KEY_CACHE_SIZE = "cache_size"
+KEY_SAMPLER = "sampler"
+KEY_STRATEGY = "strategy"
+KEY_GRID_LEVELS = "grid_levels"
+KEY_OUTPUT_FORMAT = "output_format"
+KEY_TAR_SHARD_SIZE = "tar_shard_size"
+KEY_MEMMAP_DTYPE = "memmap_dtype"
+
+SHARD_DIR = "shard_{}"
+
+
+class RenderJob:
+    """Describes everything needed to render a dataset, independent of any panel or window context.
+
+    A job can either be created from the properties of the Node Editor panel (see from_props) or from a JSON job spec
+    file (see from_json), which is what the headless entry point in bnr.cli uses.
+    """
+
+    def __init__(self, material_name, output_dir, render_amount=5, x_res=128, y_res=128, parameter_setup="",
+                 use_standard_setup=True, eliminate_parameters=False, workers=1, start_index=0, end_index=None,
+                 worker_id=None, resume=False, param_format="JSON", capture=False, write_images=True,
+                 image_format="PNG", encoder_threads=2, encoder_queue=8, seed=None, batch_size=1, atlas=1, reorder=False,
+                 profile=PROFILE_DEFAULT, cache=False, cache_dir=None, cache_size=None,
+                 sampler=SAMPLER_RANDOM, strategy="SIMULTANEOUS", grid_levels=3, output_format="FILES", tar_shard_size=1000,
+                 memmap_dtype="UINT8"):
+        """
+        Arguments:
+            material_name -- Name of the material whose node parameters are varied
+            output_dir -- Directory that renders and label files are written to
+            render_amount -- The total number of images to render (strategies like the grid decide this themselves)
+            x_res, y_res -- Resolution of the renders
+            parameter_setup -- Path to a parameter setup file saved with NODE_EDITOR_OP_SaveParameterSetup (optional)
+            use_standard_setup -- If true, renders the material on a plane in a standard camera/HDRI scene
+            eliminate_parameters -- If true, runs parameter elimination before rendering
+            workers -- The number of background Blender processes to shard the job over
+            start_index, end_index -- The range of sample indices [start_index, end_index) that this process renders
+            worker_id -- Set when this process is one of the workers of a sharded job
+            resume -- If true, continues a previously interrupted job in output_dir instead of starting over
+            param_format -- Format of the final parameter data file, see bnr.src.misc.param_writer
+            capture -- If true, renders are captured into memory (see bnr.src.misc.capture) instead of written by Blender
+            write_images -- If false (and capture is set), captured renders are only handed to the consumer, not saved
+            image_format -- Format that captured renders are encoded to (see bnr.src.misc.encoder.IMAGE_FORMATS)
+            encoder_threads -- Number of background threads that encode and write captured renders
+            encoder_queue -- Maximum number of captured renders waiting to be encoded, before rendering pauses
+            seed -- Seed that all sampled parameter values are derived from (a random seed is chosen if None)
+            batch_size -- If greater than 1 (and capture is not set), this many samples are keyframed onto consecutive frames
+                          and rendered with a single animation render (see bnr.src.misc.batch)
+            atlas -- If greater than 1, atlas x atlas samples are rendered at once as the tiles of a single render and
+                     captured into memory (see bnr.src.misc.atlas)
+            reorder -- If true, samples are rendered in an order in which parameters that make EEVEE recompile the shader
+                       change as rarely as possible (see bnr.src.misc.ordering)
+            profile -- Name of the render quality profile (see bnr.src.misc.profiles)
+            cache -- If true, renders are looked up in and added to a render cache (see bnr.src.misc.render_cache)
+            cache_dir, cache_size -- Directory and maximum size in MB of the render cache (defaults of RenderCache if None)
+            sampler -- Name of the sampler that generates the parameter values (see bnr.src.misc.samplers)
+            strategy -- Name of the permutation strategy (see bnr.src.misc.strategies)
+            grid_levels -- Number of values per parameter of the grid strategy
+            output_format -- "FILES" writes every image to its own file, "TAR" packs the samples into tar shards of
+                             tar_shard_size samples each, with their labels and parameters (see bnr.src.misc.tar_store),
+                             "MEMMAP" fills preallocated image and label arrays (see bnr.src.misc.memmap_store)
+            memmap_dtype -- Data type of the "MEMMAP" images, "UINT8" (display values) or "FLOAT16" (scene linear)
+        """
+        self.material_name = material_name
+        self.output_dir = os.path.join(output_dir, "")  # Always end with a separator, file names are appended
+        self.render_amount = render_amount
+        self.x_res = x_res
+        self.y_res = y_res
+        self.parameter_setup = parameter_setup
+        self.use_standard_setup = use_standard_setup
+        self.eliminate_parameters = eliminate_parameters
+        self.workers = workers
+        self.start_index = start_index
+        self.end_index = render_amount if end_index is None else end_index
+        self.worker_id = worker_id
+        self.resume = resume
+        self.param_format = param_format
+        self.capture = capture
+        self.write_images = write_images
+        self.image_format = image_format
+        self.encoder_threads = encoder_threads
+        self.encoder_queue = encoder_queue
+        self.seed = new_seed() if seed is None else seed
+        self.batch_size = batch_size
+        self.atlas = atlas
+        self.reorder = reorder
+        self.profile = profile
+        self.cache = cache
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.sampler = sampler
+        self.strategy = strategy
+        self.grid_levels = grid_levels
+        self.output_format = output_format
+        self.tar_shard_size = tar_shard_size
+        self.memmap_dtype = memmap_dtype
+
+    def set_sample_count(self, n):
+        """Sets the total number of samples (as decided by the permutation strategy). If this process renders all samples,
+        its index range is extended to the new count."""
+        if self.start_index == 0 and self.end_index == self.render_amount:
+            self.end_index = n
+        self.render_amount = n
+
+    @property
+    def indices(self):
+        """The global sample indices rendered by this process."""
+        return range(self.start_index, self.end_index)
+
+    @property
+    def metadata_dir(self):
+        """The directory that parameter data and labels are written to. Workers of a sharded job each write to their own
+        directory, these are merged once all workers are done (see bnr.src.misc.shard)."""
+        if self.worker_id is None:
+            return self.output_dir
+
+        return os.path.join(self.output_dir, SHARD_DIR.format(self.worker_id), "")
+
+    @classmethod
+    def from_props(cls, props, material):
+        """Creates a job from the public properties (PG_PublicProps) of a scene."""
+        return cls(
+            material.name,
+            props.render_output_dir,
+            render_amount=props.render_amount,
+            x_res=props.x_res,
+            y_res=props.y_res,
+            use_standard_setup=props.use_standard_setup,
+            eliminate_parameters=props.eliminate_parameters,
+            workers=props.workers,
+            resume=props.resume,
+            param_format=props.param_format,
+            capture=props.capture,
+            image_format=props.image_format,
+            encoder_threads=props.encoder_threads,
+            seed=props.seed or None,  # 0 means random
+            batch_size=props.batch_size,
+            atlas=props.atlas,
+            reorder=props.reorder,
+            profile=props.profile,
+            cache=props.use_cache,
+            sampler=props.sampler,
+            strategy=props.permutation_strategy,
+            grid_levels=props.grid_levels,
+            output_format=props.output_format,
+            tar_shard_size=props.tar_shard_size,
+            memmap_dtype=props.memmap_dtype,
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Creates a job from a dictionary with the same keys as a JSON job spec file.
+
+        Raises:
+            KeyError if the material or the output dir is missing
+        """
+        return cls(
+            data[KEY_MATERIAL],
+            data[KEY_OUTPUT_DIR],
+            render_amount=data.get(KEY_RENDER_AMOUNT, 5),
+            x_res=data.get(KEY_X_RES, 128),
+            y_res=data.get(KEY_Y_RES, 128),
+            parameter_setup=data.get(KEY_PARAMETER_SETUP, ""),
+            use_standard_setup=data.get(KEY_USE_STANDARD_SETUP, True),
+            eliminate_parameters=data.get(KEY_ELIMINATE_PARAMETERS, False),
+            workers=data.get(KEY_WORKERS, 1),
+            start_index=data.get(KEY_START_INDEX, 0),
+            end_index=data.get(KEY_END_INDEX),
+            worker_id=data.get(KEY_WORKER_ID),
+            resume=data.get(KEY_RESUME, False),
+            param_format=data.get(KEY_PARAM_FORMAT, "JSON"),
+            capture=data.get(KEY_CAPTURE, False),
+            write_images=data.get(KEY_WRITE_IMAGES, True),
+            image_format=data.get(KEY_IMAGE_FORMAT, "PNG"),
+            encoder_threads=data.get(KEY_ENCODER_THREADS, 2),
+            encoder_queue=data.get(KEY_ENCODER_QUEUE, 8),
+            seed=data.get(KEY_SEED),
+            batch_size=data.get(KEY_BATCH_SIZE, 1),
+            atlas=data.get(KEY_ATLAS, 1),
+            reorder=data.get(KEY_REORDER, False),
+            profile=data.get(KEY_PROFILE, PROFILE_DEFAULT),
+            cache=data.get(KEY_CACHE, False),
+            cache_dir=data.get(KEY_CACHE_DIR),
+            cache_size=data.get(KEY_CACHE_SIZE),
+            sampler=data.get(KEY_SAMPLER, SAMPLER_RANDOM),
+            strategy=data.get(KEY_STRATEGY, "SIMULTANEOUS"),
+            grid_levels=data.get(KEY_GRID_LEVELS, 3),
+            output_format=data.get(KEY_OUTPUT_FORMAT, "FILES"),
+            tar_shard_size=data.get(KEY_TAR_SHARD_SIZE, 1000),
+            memmap_dtype=data.get(KEY_MEMMAP_DTYPE, "UINT8"),
+        )
+
+    @classmethod
+    def from_json(cls, filepath: str):
+        """Loads a job from a JSON job spec file. Relative paths in the spec are resolved against the spec's directory."""
+        with open(filepath, "r") as f:
+            data = json.load(f)
+
+        spec_dir = os.path.dirname(os.path.abspath(filepath))
+        for key in (KEY_OUTPUT_DIR, KEY_PARAMETER_SETUP):
+            if data.get(key):
+                data[key] = os.path.join(spec_dir, data[key])
+
+        return cls.from_dict(data)
+
+    def to_dict(self) -> dict:
+        return {
+            KEY_MATERIAL: self.material_name,
+            KEY_OUTPUT_DIR: self.output_dir,
+            KEY_RENDER_AMOUNT: self.render_amount,
+            KEY_X_RES: self.x_res,
+            KEY_Y_RES: self.y_res,
+            KEY_PARAMETER_SETUP: self.parameter_setup,
+            KEY_USE_STANDARD_SETUP: self.use_standard_setup,
+            KEY_ELIMINATE_PARAMETERS: self.eliminate_parameters,
+            KEY_WORKERS: self.workers,
+            KEY_START_INDEX: self.start_index,
+            KEY_END_INDEX: self.end_index,
+            KEY_WORKER_ID: self.worker_id,
+            KEY_RESUME: self.resume,
+            KEY_PARAM_FORMAT: self.param_format,
+            KEY_CAPTURE: self.capture,
+            KEY_WRITE_IMAGES: self.write_images,
+            KEY_IMAGE_FORMAT: self.image_format,
+            KEY_ENCODER_THREADS: self.encoder_threads,
+            KEY_ENCODER_QUEUE: self.encoder_queue,
+            KEY_SEED: self.seed,
+            KEY_BATCH_SIZE: self.batch_size,
+            KEY_ATLAS: self.atlas,
+            KEY_REORDER: self.reorder,
+            KEY_PROFILE: self.profile,
+            KEY_CACHE: self.cache,
+            KEY_CACHE_DIR: self.cache_dir,
+            KEY_CACHE_SIZE: self.cache_size,
+            KEY_SAMPLER: self.sampler,
+            KEY_STRATEGY: self.strategy,
+            KEY_GRID_LEVELS: self.grid_levels,
+            KEY_OUTPUT_FORMAT: self.output_format,
+            KEY_TAR_SHARD_SIZE: self.tar_shard_size,
+            KEY_MEMMAP_DTYPE: self.memmap_dtype,
+        }
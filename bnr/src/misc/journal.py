@@ -0,0 +1,107 @@
+import hashlib
+import os
+
+from bnr.src.misc.jsonl import JsonlAppender, iter_records, sorted_records, KEY_INDEX
+from bnr.src.misc.tar_store import member_checksums, split_member
+
+JOURNAL_FILE = "journal.jsonl"
+
+KEY_LABELS = "labels"
+KEY_FILE = "file"
+KEY_CHECKSUM = "checksum"
+
+
+def file_checksum(filepath, chunk_size=1 << 16):
+    """Returns the SHA-1 hex digest of a file."""
+    h = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def pixel_checksum(pixels):
+    """Returns the SHA-1 hex digest of a captured pixel buffer, used for samples that are not written to a file."""
+    return hashlib.sha1(pixels.tobytes()).hexdigest()
+
+
+def _relative_path(filepath):
+    """Returns the file name of an image, relative to the output directory (including the shard of images in tar shards)."""
+    path, member = split_member(filepath)
+    return os.path.basename(path) if member is None else os.path.basename(path) + "/" + member
+
+
+class Journal:
+    """An append-only log with one JSON record per rendered sample.
+
+    A record is only appended after its image has been written, and every record is flushed to disk before the next sample
+    is rendered. If the process crashes, the journal therefore holds every sample that was completely rendered (at most
+    the very last line can be incomplete, which is ignored when reading).
+    """
+
+    def __init__(self, filepath, fsync=True):
+        """
+        Arguments:
+            fsync -- If false, records are not waited for to reach the disk (for journals that are written in one go)
+        """
+        self.filepath = filepath
+        self._appender = JsonlAppender(filepath, fsync=fsync)
+
+    def records(self):
+        """Yields all complete records in the order they were written."""
+        for _, record in iter_records(self.filepath):
+            yield record
+
+    def sorted_records(self, indices: range):
+        """Yields the last record of every journaled sample in indices, ordered by sample index."""
+        return sorted_records(self.filepath, indices)
+
+    def completed(self, directory):
+        """Returns the indices of all samples whose image still exists in directory and matches the checksum of its
+        record. Samples that were only captured in memory (without an image file) are trusted. Images inside tar shards
+        (see bnr.src.misc.tar_store) are checked by reading each shard once. If a sample was journaled more than once, the
+        last record is used.
+
+        Returns:
+            A set of sample indices
+        """
+        checksums = {}
+        for record in self.records():
+            checksums[record[KEY_INDEX]] = (record[KEY_FILE], record[KEY_CHECKSUM])
+
+        completed = set()
+        members = {}
+        for index, (filename, checksum) in checksums.items():
+            if filename is None:
+                completed.add(index)
+                continue
+
+            path, member = split_member(os.path.join(directory, filename))
+            if member is not None:
+                members.setdefault(path, {})[member] = (index, checksum)
+            elif os.path.exists(path) and file_checksum(path) == checksum:
+                completed.add(index)
+
+        for path, shard_members in members.items():
+            found = member_checksums(path, set(shard_members))
+            completed.update(index for member, (index, checksum) in shard_members.items() if found.get(member) == checksum)
+
+        return completed
+
+    def open(self, resume=False):
+        """Opens the journal for appending. Unless resuming, any existing journal is cleared."""
+        self._appender.open(resume=resume)
+
+    def append(self, index, labels, filepath=None, checksum=None):
+        """Records a completed sample. Unless a checksum is given, it is computed from the image file. If no file was written
+        for the sample, the checksum must be given (see pixel_checksum)."""
+        self._appender.append({
+            KEY_INDEX: index,
+            KEY_LABELS: labels,
+            KEY_FILE: _relative_path(filepath) if filepath else None,
+            KEY_CHECKSUM: checksum or file_checksum(filepath),
+        })
+
+    def close(self):
+        self._appender.close()
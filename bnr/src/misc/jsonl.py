@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+
+KEY_INDEX = "index"
+
+
+def truncate_after_last_line(f, chunk_size=1 << 12):
+    """Cuts off everything after the last newline of a file opened in 'rb+' mode, without reading the whole file."""
+    pos = f.seek(0, os.SEEK_END)
+    while pos > 0:
+        step = min(chunk_size, pos)
+        pos -= step
+        f.seek(pos)
+        i = f.read(step).rfind(b"\n")
+        if i >= 0:
+            f.truncate(pos + i + 1)
+            return
+
+    f.truncate(0)
+
+
+class JsonlAppender:
+    """Appends one JSON record per line to a file and flushes it right away, so that every record that was appended
+    survives a crash of the process (at most the very last line can be incomplete, which readers ignore)."""
+
+    def __init__(self, filepath, fsync=False):
+        """
+        Arguments:
+            fsync -- If true, also waits for every record to be written to the disk (not just to the OS)
+        """
+        self.filepath = filepath
+        self.fsync = fsync
+        self._file = None
+
+    def open(self, resume=False):
+        """Opens the file for appending. Unless resuming, any existing file is cleared.
+        When resuming, an incomplete trailing record (from a crash while writing it) is cut off first."""
+        if resume and os.path.exists(self.filepath):
+            with open(self.filepath, "rb+") as f:
+                truncate_after_last_line(f)
+
+        self._file = open(self.filepath, "a" if resume else "w")
+
+    def append(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def iter_records(filepath):
+    """Yields (byte offset, record) for all complete records of a JSONL file, in the order they were written."""
+    if not os.path.exists(filepath):
+        return
+
+    with open(filepath, "rb") as f:
+        offset = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                return  # The last record was not completely written
+
+            try:
+                yield offset, json.loads(line.decode("utf-8"))
+            except ValueError:
+                return
+            offset += len(line)
+
+
+def index_offsets(filepath, indices: range) -> np.ndarray:
+    """Finds the byte offset of the record of every sample index in indices (-1 if there is none).
+    If an index was written more than once, the last record wins. Only the offsets are kept in memory."""
+    offsets = np.full(len(indices), -1, dtype=np.int64)
+    for offset, record in iter_records(filepath):
+        r = record[KEY_INDEX]
+        if r in indices:
+            offsets[r - indices.start] = offset
+
+    return offsets
+
+
+def sorted_records(filepath, indices: range):
+    """Yields the records of a JSONL file ordered by sample index, without loading the file into memory."""
+    if not os.path.exists(filepath):
+        return
+
+    offsets = index_offsets(filepath, indices)
+
+    with open(filepath, "rb") as f:
+        for offset in offsets:
+            if offset < 0:
+                continue
+
+            f.seek(offset)
+            yield json.loads(f.readline().decode("utf-8"))
@@ -0,0 +1,91 @@
+"""A binary manifest of a dataset with one fixed width record per sample (up to the last sample a job renders), stored as a
+structured NumPy array in manifest.npy. Record r tells where the image of sample r is stored (its own file, or a tar shard and offset, see bnr.src.misc.tar_store),
+its checksum, its design row, its render time and the worker that rendered it, so any sample can be looked up in O(1).
+Subsets can be selected with vectorized conditions on the memory mapped fields (all fields of samples that are not rendered
+are 0), e.g.
+
+    manifest = np.load("manifest.npy", mmap_mode="r")
+    slow = np.flatnonzero(manifest["rendered"] & (manifest["seconds"] > 2.0))
+"""
+import os
+
+import numpy as np
+
+from bnr.src.misc.tar_store import split_member
+
+MANIFEST_FILE = "manifest.npy"
+NO_SHARD = -1  # Shard of samples whose image is its own file (or that have no image)
+NO_WORKER = -1  # Worker of samples rendered by a job that was not sharded
+
+MANIFEST_DTYPE = np.dtype([
+    ("rendered", np.uint8),  # 1 once the sample is complete
+    ("worker", np.int16),  # Worker id of a sharded job
+    ("shard", np.int32),  # Number of the tar shard that holds the image (see tar_store.shard_filename)
+    ("offset", np.int64),  # Byte offset of the image in its shard, 0 for image files
+    ("size", np.int64),  # Size of the image in bytes, 0 if no image was written
+    ("design_row", np.int64),  # Row of the sample in the design of the job that rendered it (see merge_map.csv if merged)
+    ("seconds", np.float32),  # Render time (split evenly between the samples of a batch or atlas)
+    ("checksum", np.uint8, (20,)),  # SHA-1 of the image, or of the captured pixels if no image was written
+])
+
+
+class Manifest:
+    """The memory mapped manifest of a job. Workers of a sharded job all write their own records to the same file."""
+
+    def __init__(self, records: np.ndarray):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    @classmethod
+    def create(cls, directory, n):
+        """Creates the manifest of samples [0, n). Records are only written once their sample is rendered, so the file is
+        sparse where the file system supports it."""
+        records = np.lib.format.open_memmap(directory + MANIFEST_FILE, mode="w+", dtype=MANIFEST_DTYPE, shape=(n,))
+        records.flush()
+        return cls(records)
+
+    @classmethod
+    def open(cls, directory):
+        """Opens the manifest in directory for writing."""
+        return cls(np.load(directory + MANIFEST_FILE, mmap_mode="r+"))
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(directory + MANIFEST_FILE)
+
+    def locate(self, index, shard, offset, size):
+        """Records where in a tar shard the image of a sample was written (called by the TarShardStore)."""
+        record = self.records[index:index + 1]
+        record["shard"] = shard
+        record["offset"] = offset
+        record["size"] = size
+
+    def complete(self, index, checksum, filepath=None, worker_id=None, design_row=None):
+        """Records a completed sample.
+
+        Arguments:
+            checksum -- The SHA-1 hex digest of the image (or pixels)
+            filepath -- The location of the image, None if no image was written
+            design_row -- The row of the sample in the design it was rendered from, if it is not index
+        """
+        record = self.records[index:index + 1]
+        if filepath is None or split_member(filepath)[1] is None:  # Images in tar shards are located by the TarShardStore
+            record["shard"] = NO_SHARD
+            record["offset"] = 0
+            record["size"] = 0 if filepath is None else os.path.getsize(filepath)
+        record["design_row"] = index if design_row is None else design_row
+        record["worker"] = NO_WORKER if worker_id is None else worker_id
+        record["checksum"] = np.frombuffer(bytes.fromhex(checksum), dtype=np.uint8)
+        record["rendered"] = 1
+
+    def log(self, indices, seconds):
+        """Records the render time of a render that produced the given samples (time is split evenly between them)."""
+        self.records["seconds"][list(indices)] = seconds / len(indices)
+
+    def flush(self):
+        self.records.flush()
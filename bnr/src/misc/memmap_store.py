@@ -0,0 +1,74 @@
+"""Stores a dataset as two preallocated NumPy arrays instead of image files and CSV labels: images.npy of shape (N, H, W, C)
+and labels.npy of shape (N, P). Renders are copied into their row as soon as they are captured, so a finished (or partly
+finished) dataset can be opened with np.load(path, mmap_mode="r") without decoding or parsing anything.
+"""
+import os
+
+import numpy as np
+
+from bnr.src.misc.capture import to_uint8
+
+OUTPUT_MEMMAP = "MEMMAP"
+
+IMAGES_FILE = "images.npy"
+LABELS_NPY_FILE = "labels.npy"
+
+DTYPE_UINT8 = "UINT8"  # 8 bit display values, like PNG images
+DTYPE_FLOAT16 = "FLOAT16"  # Scene linear values, like NPY images
+DTYPES = {DTYPE_UINT8: np.uint8, DTYPE_FLOAT16: np.float16}
+
+COLOR_MODE_CHANNELS = {"BW": 1, "RGB": 3, "RGBA": 4}
+_LUMA = np.array([0.299, 0.587, 0.114])  # Weights of PIL's conversion to grayscale
+
+
+def to_channels(pixels: np.ndarray, channels) -> np.ndarray:
+    """Reduces RGBA pixels to the given number of channels (4: RGBA, 3: RGB, 1: luma)."""
+    if channels == 1:
+        luma = (pixels[..., :3] @ _LUMA)[..., None]
+        if np.issubdtype(pixels.dtype, np.integer):
+            luma = np.rint(luma)  # Round like the 8 bit display values, instead of truncating
+        return luma.astype(pixels.dtype)
+
+    return pixels[..., :channels]
+
+
+class MemmapDataset:
+    """The image and label arrays of a dataset, memory mapped. Rows of samples that are not rendered yet have NaN labels."""
+
+    def __init__(self, images: np.ndarray, labels: np.ndarray):
+        self.images = images
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.images)
+
+    @classmethod
+    def create(cls, directory, n, height, width, channels, parameters, dtype=DTYPE_UINT8):
+        """Creates the arrays of a dataset of n samples in directory. The files are sparse where the file system supports
+        it, so they only take up disk space as they are filled."""
+        images = np.lib.format.open_memmap(directory + IMAGES_FILE, mode="w+", dtype=DTYPES[dtype],
+                                           shape=(n, height, width, channels))
+        labels = np.lib.format.open_memmap(directory + LABELS_NPY_FILE, mode="w+", dtype=np.float32, shape=(n, parameters))
+        labels[:] = np.nan
+        labels.flush()
+        return cls(images, labels)
+
+    @classmethod
+    def open(cls, directory):
+        """Opens the arrays of a dataset in directory for writing."""
+        return cls(np.load(directory + IMAGES_FILE, mmap_mode="r+"), np.load(directory + LABELS_NPY_FILE, mmap_mode="r+"))
+
+    @staticmethod
+    def exists(directory):
+        return all(os.path.exists(directory + f) for f in (IMAGES_FILE, LABELS_NPY_FILE))
+
+    def write(self, index, pixels: np.ndarray, labels):
+        """Writes a captured render (see bnr.src.misc.capture.render_to_array) and its labels to row index."""
+        if self.images.dtype == np.uint8:
+            pixels = to_uint8(pixels)
+        self.images[index] = to_channels(pixels, self.images.shape[-1])
+        self.labels[index] = labels
+
+    def flush(self):
+        self.images.flush()
+        self.labels.flush()
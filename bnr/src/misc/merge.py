@@ -0,0 +1,249 @@
+"""Merges the datasets of several runs (output directories of jobs that rendered the same material) into one dataset. Samples
+are renumbered consecutively, run after run, and streamed one at a time, so memory use does not depend on the size of the runs.
+
+The samples of a run are the ones recorded in its journal (see bnr.src.misc.journal), including the journals of the workers
+of a sharded run, also if the run was interrupted before the data of its workers was merged. Images are hard linked into the
+merged dataset when the runs are on the same file system, and copied otherwise. Images inside tar shards are extracted to
+files. Which run and sample every merged sample came from is written to merge_map.csv, and the merged dataset gets its own
+manifest (see bnr.src.misc.manifest).
+"""
+import csv
+import glob
+import json
+import os
+import shutil
+import sys
+import tarfile
+
+import numpy as np
+
+from bnr.src.misc.job import SHARD_DIR
+from bnr.src.misc.journal import Journal, JOURNAL_FILE, KEY_CHECKSUM, KEY_FILE, KEY_LABELS
+from bnr.src.misc.jsonl import iter_records, sorted_records, KEY_INDEX
+from bnr.src.misc.manifest import Manifest, MANIFEST_FILE
+from bnr.src.misc.param_store import ParamStore, PARAM_SCHEMA_FILE
+from bnr.src.misc.param_writer import (ParamDataWriter, write_param_data, FORMAT_JSON, KEY_PARAMS, LABELS_CHUNK, LABELS_FILE,
+                                       PARAM_DATA_JSONL_FILE)
+from bnr.src.misc.tar_store import split_member
+
+PARAM_MIN_MAX_FILE = "param_min_max.json"
+MERGE_MAP_FILE = "merge_map.csv"
+
+
+def _recorded_indices(filepath) -> range:
+    """Returns the range of sample indices up to the highest index recorded in a JSONL file."""
+    return range(1 + max((record[KEY_INDEX] for _, record in iter_records(filepath)), default=-1))
+
+
+def _shard_dirs(run_dir) -> list:
+    """Returns the directories of the workers of a sharded run, in worker order."""
+    shard_dirs = glob.glob(os.path.join(run_dir, SHARD_DIR.format("*"), ""))
+    shard_dirs.sort(key=lambda d: int(os.path.basename(os.path.dirname(d)).rsplit("_", 1)[1]))
+    return shard_dirs
+
+
+def run_files(run_dir, filename) -> list:
+    """Returns the paths of a file of a run: its own, or those of its workers (in worker order) if it was sharded and their
+    files were not merged (because the run was interrupted)."""
+    if os.path.exists(run_dir + filename):
+        return [run_dir + filename]
+
+    return [d + filename for d in _shard_dirs(run_dir) if os.path.exists(d + filename)]
+
+
+def run_journals(run_dir) -> list:
+    """Returns the journal files of a run: its own, or those of its workers if it was sharded (in worker order)."""
+    journals = [run_dir + JOURNAL_FILE] if os.path.exists(run_dir + JOURNAL_FILE) else []
+    return journals + [d + JOURNAL_FILE for d in _shard_dirs(run_dir) if os.path.exists(d + JOURNAL_FILE)]
+
+
+def run_samples(run_dir):
+    """Yields the last journal record of every sample of a run, ordered by sample index."""
+    for journal_path in run_journals(run_dir):
+        yield from Journal(journal_path).sorted_records(_recorded_indices(journal_path))
+
+
+def run_params(run_dir):
+    """Returns a function that returns the parameters of a sample of a run, for increasing sample indices."""
+    param_files = run_files(run_dir, PARAM_DATA_JSONL_FILE)
+    if param_files:
+        # The workers of a sharded run render consecutive index ranges, so their records are in order one after the other
+        records = (record for path in param_files for record in sorted_records(path, _recorded_indices(path)))
+        current = [None]
+
+        def params(index):
+            # Both the journal and the parameter records are ordered by sample index, so a single pass suffices
+            while current[0] is None or current[0][KEY_INDEX] < index:
+                current[0] = next(records, {KEY_INDEX: float("inf")})
+            return current[0][KEY_PARAMS] if current[0][KEY_INDEX] == index else None
+
+        return params
+    if os.path.exists(run_dir + PARAM_SCHEMA_FILE):
+        store = ParamStore(run_dir)
+        return lambda index: store[index]
+
+    raise ValueError("{} has no parameter data ({} or {}, neither in the run nor in the directories of its workers)".format(
+        run_dir, PARAM_DATA_JSONL_FILE, PARAM_SCHEMA_FILE))
+
+
+def check_schemas(run_dirs):
+    """Makes sure that all runs varied the same parameters with the same ranges.
+
+    Returns:
+        The parameter schema (the contents of param_min_max.json)
+
+    Raises:
+        ValueError if the param_min_max.json of a run (or of its first worker) is missing or differs from the first run's
+    """
+    schema = None
+    for run_dir in run_dirs:
+        paths = run_files(run_dir, PARAM_MIN_MAX_FILE)
+        if not paths:
+            raise ValueError("{} is not a dataset, it has no {}".format(run_dir, PARAM_MIN_MAX_FILE))
+        with open(paths[0], "r") as f:
+            run_schema = json.load(f)
+        if schema is None:
+            schema = run_schema
+        elif run_schema != schema:
+            raise ValueError("The parameters of {} differ from those of {}, they can not be merged".format(run_dir, run_dirs[0]))
+
+    return schema
+
+
+def write_manifest(output_dir, run_dirs, n):
+    """Writes the manifest of a merged dataset of n samples from its journal and merge map. Every sample gets the design row
+    that it was rendered from (its index in its run, or the design row of that index if the run was merged itself), and the
+    render time from the manifest of its run, if the run has one."""
+    manifest = Manifest.create(output_dir, n)
+    run_manifests = [np.load(d + MANIFEST_FILE, mmap_mode="r") if os.path.exists(d + MANIFEST_FILE) else None for d in run_dirs]
+
+    with open(output_dir + MERGE_MAP_FILE, "r", newline="") as f:
+        rows = csv.reader(f)
+        next(rows)  # Header
+        for record, (_, run, run_index) in zip(Journal(output_dir + JOURNAL_FILE).sorted_records(range(n)), rows):
+            r, run_index = record[KEY_INDEX], int(run_index)
+            source = run_manifests[int(run)]
+            source = source[run_index] if source is not None and run_index < len(source) else None
+            design_row = int(source["design_row"]) if source is not None and source["rendered"] else run_index
+            manifest.complete(r, record[KEY_CHECKSUM], filepath=os.path.join(output_dir, record[KEY_FILE]), design_row=design_row)
+            if source is not None:
+                manifest.log([r], float(source["seconds"]))
+
+    manifest.flush()
+
+
+class _ImageSource:
+    """Links or copies the images of a run into the merged dataset. Only the tar shard that is currently read from is kept
+    open."""
+
+    def __init__(self, link=True):
+        self.link = link
+        self._tar_path = None
+        self._tar = None
+
+    def put(self, location, target) -> bool:
+        """Links or copies the image at location to target. Returns false if the image does not exist."""
+        tar_path, member = split_member(location)
+        if not os.path.exists(tar_path):
+            return False
+
+        if member is not None:
+            if tar_path != self._tar_path:
+                self.close()
+                self._tar_path, self._tar = tar_path, tarfile.open(tar_path, "r")
+            try:
+                src = self._tar.extractfile(member)
+            except KeyError:
+                return False
+            with src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            return True
+
+        if os.path.exists(target):
+            os.remove(target)  # Left over from an earlier merge, a hard link would fail
+        if self.link:
+            try:
+                os.link(location, target)
+                return True
+            except OSError:
+                pass  # Other file system (or no hard links supported), copy instead
+        shutil.copyfile(location, target)
+        return True
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar, self._tar_path = None, None
+
+
+def merge_runs(output_dir, run_dirs, link=True, param_format=FORMAT_JSON):
+    """Merges the datasets of run_dirs into output_dir. Samples without an image file (like renders that were only captured
+    into memory) or whose image is missing are skipped.
+
+    Arguments:
+        link -- If true, images are hard linked instead of copied where possible
+        param_format -- Format of the merged parameter data file (see bnr.src.misc.param_writer)
+
+    Returns:
+        The number of merged samples
+
+    Raises:
+        ValueError if output_dir is one of the run directories, or the runs can not be merged (see check_schemas)
+    """
+    output_dir = os.path.join(output_dir, "")
+    run_dirs = [os.path.join(d, "") for d in run_dirs]
+    for run_dir in run_dirs:
+        if os.path.realpath(run_dir) == os.path.realpath(output_dir):
+            raise ValueError("The runs can not be merged into {}, it is one of the runs".format(run_dir))
+    schema = check_schemas(run_dirs)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(output_dir + PARAM_MIN_MAX_FILE, "w") as f:
+        json.dump(schema, f)
+
+    param_writer = ParamDataWriter(output_dir)
+    param_writer.open()
+    journal = Journal(output_dir + JOURNAL_FILE, fsync=False)
+    journal.open()
+    images = _ImageSource(link=link)
+    merged = 0
+    skipped = 0
+    labels = []
+
+    with open(output_dir + LABELS_FILE, "w", newline="") as labels_f, open(output_dir + MERGE_MAP_FILE, "w") as map_f:
+        map_f.write("index,run,run_index\n")
+
+        def flush_labels():
+            if labels:
+                np.savetxt(labels_f, np.array(labels), fmt="%.8g", delimiter=",")
+                labels.clear()
+
+        try:
+            for run, run_dir in enumerate(run_dirs):
+                params = run_params(run_dir)
+                for record in run_samples(run_dir):
+                    r = record[KEY_INDEX]
+                    location = os.path.join(run_dir, record[KEY_FILE]) if record[KEY_FILE] else None
+                    pd = params(r)
+                    target = "{}{}{}".format(output_dir, merged, os.path.splitext(location or "")[1])
+                    if location is None or pd is None or not images.put(location, target):
+                        skipped += 1
+                        continue
+
+                    param_writer.write(merged, pd)
+                    journal.append(merged, record[KEY_LABELS], filepath=target, checksum=record[KEY_CHECKSUM])
+                    map_f.write("{},{},{}\n".format(merged, run, r))
+                    labels.append(record[KEY_LABELS])
+                    if len(labels) >= LABELS_CHUNK:
+                        flush_labels()
+                    merged += 1
+                images.close()
+            flush_labels()
+        finally:
+            images.close()
+            param_writer.close()
+            journal.close()
+
+    write_param_data(output_dir, range(merged), param_format=param_format)
+    write_manifest(output_dir, run_dirs, merged)
+    sys.stdout.write("Merged {} samples of {} runs into {} ({} skipped)\n".format(merged, len(run_dirs), output_dir, skipped))
+    return merged
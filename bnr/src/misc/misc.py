@@ -1,9 +1,12 @@
+import numpy as np
+
+
 def normalize(val, umin, umax):
-    """Normalizes the value to range [-1,1]"""
-    try:
-        return ((val - umin) / (umax - umin)) * 2 - 1
-    except ZeroDivisionError:
-        return 1
+    """Normalizes the value (or an array of values, with their minimums and maximums broadcast against them) to range [-1,1].
+    Values of a parameter whose minimum equals its maximum are 1."""
+    span = np.asarray(umax, dtype=np.float64) - umin
+    safe_span = np.where(span == 0, 1, span)
+    return np.where(span == 0, 1, ((val - umin) / safe_span) * 2 - 1)[()]
 
 
 def list_(value):
@@ -13,17 +16,3 @@ def list_(value):
     except TypeError:
         return [value]
 
-
-def color_clamp(val):
-    """Controls the value val so that it is in the range [0,1] and if the value is larger than 1, the overflow will be added to zero. 
-    If the value is less than zero, the overflow will be subtracted from 1. In this way, we can produce well centered HSV values, even if the mean
-    is around 0 or 1.
-    
-    Example:
-        1.5 will be converted to 0.5
-        2.3 will be converted to 0.3
-        -1 will be converted to 0
-        -0.3 will be converted to 0.7
-        0.5 will be converted to 0.5    
-    """
-    return val % 1
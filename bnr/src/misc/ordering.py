@@ -0,0 +1,95 @@
+import sys
+import time
+
+import numpy as np
+from bpy import ops
+
+RENDER_TIMES_FILE = "render_times.csv"
+RECOMPILE_FACTOR = 2.0  # A probe render this many times slower than a plain render counts as a shader recompilation
+BASELINE_RENDERS = 3
+
+
+def time_render(scene) -> float:
+    """Renders the scene without writing a file and returns the time it took."""
+    start = time.time()
+    ops.render.render(write_still=False, scene=scene.name)
+    return time.time() - start
+
+
+def probe_recompiles(scene, plan, values: np.ndarray) -> list:
+    """Finds the bound sockets whose changes make EEVEE recompile the material's shader, instead of only updating a uniform.
+
+    Every binding is changed on its own between two design rows and rendered once. A render that takes much longer than a
+    render after a change that needs no recompilation is counted as a recompilation. This costs len(plan) + BASELINE_RENDERS + 1
+    renders.
+
+    Arguments:
+        scene -- The scene to render
+        plan -- The BindingPlan of the material
+        values -- Two (different) rows of the design matrix
+
+    Returns:
+        A list with one boolean per binding of plan, true if changing the binding triggers a recompilation
+    """
+    plan.apply(values[0])
+    time_render(scene)  # Compile the shader of the first row
+    baseline = float(np.median([time_render(scene) for _ in range(BASELINE_RENDERS)]))
+
+    recompiles = []
+    for b in plan.bindings:
+        b.apply(values[1][b.columns])
+        t = time_render(scene)
+        b.apply(values[0][b.columns])
+        recompiles.append(t > RECOMPILE_FACTOR * baseline)
+        sys.stdout.write("Probed {}/{}: {:.3f}s (baseline {:.3f}s){}\n".format(
+            b.node_name, b.identifier, t, baseline, " -> recompiles shader" if recompiles[-1] else ""))
+
+    return recompiles
+
+
+def order_indices(indices: list, values: np.ndarray, columns: list) -> list:
+    """Orders sample indices so that the given design matrix columns change as rarely as possible between consecutive samples,
+    by sorting the samples lexicographically by the values of those columns (the first column changes least often).
+    Discrete parameters (like integer inputs) end up in runs of equal values, continuous ones in increasing order."""
+    if not columns or len(indices) < 2:
+        return list(indices)
+
+    idx = np.asarray(indices, dtype=np.int64)
+    keys = values[idx][:, columns]
+    order = np.lexsort(keys.T[::-1])  # lexsort sorts by the last key first
+    return idx[order].tolist()
+
+
+def recompile_aware_order(scene, plan, values: np.ndarray, indices: list) -> list:
+    """Probes which parameters trigger shader recompilation (see probe_recompiles) and orders the indices so that the values
+    of those parameters change as rarely as possible (see order_indices)."""
+    if len(indices) < 2 or len(plan) == 0:
+        return list(indices)
+
+    recompiles = probe_recompiles(scene, plan, values[indices[:2]])
+    columns = [int(c) for b, rc in zip(plan.bindings, recompiles) if rc for c in b.columns]
+    sys.stdout.write("{} of {} parameters trigger shader recompilation\n".format(sum(recompiles), len(recompiles)))
+
+    return order_indices(indices, values, columns)
+
+
+class RenderTimes:
+    """Logs the render time of every sample to a CSV file (index,seconds), so that the effect of the sample order on render
+    times can be inspected."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._file = None
+
+    def open(self, resume=False):
+        self._file = open(self.filepath, "a" if resume else "w")
+
+    def log(self, indices, seconds):
+        """Logs the render time of a render that produced the given samples (time is split evenly between them)."""
+        for r in indices:
+            self._file.write("{},{:.6f}\n".format(r, seconds / len(indices)))
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,111 @@
+"""Compact parameter data: instead of repeating every node, socket and unchanged value for every sample (param_data.json), the
+parameter schema and the values of all sockets that are never varied are stored once in param_schema.json, and the sampled
+values are the rows of the design matrix (design.npy, see bnr.src.misc.design). The design of a grid is not stored, its
+levels are stored in the schema instead and the values of a sample are decoded from its index. The parameters of a single
+sample are only assembled when they are asked for.
+
+This module does not depend on Blender, so datasets can be loaded with it in any Python environment with NumPy.
+"""
+import json
+
+import numpy as np
+
+PARAM_SCHEMA_FILE = "param_schema.json"
+PARAM_VALUES_FILE = "design.npy"  # The design matrix of the job (see design.DESIGN_FILE)
+
+KEY_PARAMETERS = "parameters"
+KEY_STATIC = "static"
+KEY_GRID = "grid"
+
+
+def write_param_schema(directory, plan, levels=None):
+    """Writes the schema of the enabled parameters (one entry per column of the design, as in param_min_max.json) and the
+    values of all inputs when the job started (see BindingPlan.static_values).
+
+    Arguments:
+        levels -- The values of every parameter of a grid design (see GridDesign), whose rows are not stored
+    """
+    schema = {KEY_PARAMETERS: plan.table.params, KEY_STATIC: plan.static_values}
+    if levels is not None:
+        schema[KEY_GRID] = [[float(v) for v in l] for l in levels]
+    with open(directory + PARAM_SCHEMA_FILE, "w") as f:
+        json.dump(schema, f)
+
+
+class GridValues:
+    """Read only rows of a grid design, decoded from the sample index like in strategies.GridStrategy (the last parameter
+    changes fastest)."""
+
+    def __init__(self, levels):
+        self.levels = levels
+        self._n = int(np.prod([len(l) for l in levels], dtype=object))
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, index) -> np.ndarray:
+        index = int(index)
+        if not 0 <= index < self._n:
+            raise IndexError("Sample {} is not in the grid of {} samples".format(index, self._n))
+
+        row = np.empty(len(self.levels))
+        for p in reversed(range(len(self.levels))):
+            index, digit = divmod(index, len(self.levels[p]))
+            row[p] = self.levels[p][digit]
+        return row
+
+
+class ParamStore:
+    """Read only view of the parameters of a dataset, in the same format as the entries of param_data.json.
+
+    Example:
+        params = ParamStore("renders/")
+        params[42]  # {"Noise Texture": {"Scale": 5.3, ...}, ...}
+    """
+
+    def __init__(self, directory):
+        with open(directory + PARAM_SCHEMA_FILE, "r") as f:
+            schema = json.load(f)
+
+        self.parameters = schema[KEY_PARAMETERS]
+        self.static = schema[KEY_STATIC]
+        if KEY_GRID in schema:
+            self.values = GridValues(schema[KEY_GRID])
+        else:
+            self.values = np.load(directory + PARAM_VALUES_FILE, mmap_mode="r")
+
+        # Columns of the same input are adjacent, group them per input
+        self._inputs = {}
+        for col, p in enumerate(self.parameters):
+            self._inputs.setdefault((p["node_name"], p["identifier"]), []).append(col)
+        self._nodes = {node_name for node_name, _ in self._inputs}
+
+    def __len__(self):
+        return len(self.values)
+
+    def row(self, index) -> np.ndarray:
+        """Returns the sampled values of a sample, one per parameter of the schema."""
+        return self.values[index]
+
+    def __getitem__(self, index) -> dict:
+        """Returns the values of all inputs of a sample, as node name -> input identifier -> value. Only the dictionaries of
+        nodes with sampled inputs are copied."""
+        row = self.values[index]
+        params = dict(self.static)
+        for node_name in self._nodes:
+            params[node_name] = dict(params[node_name])
+
+        for (node_name, identifier), columns in self._inputs.items():
+            node = params[node_name]
+            kind = self.parameters[columns[0]]["type"]
+            if kind in ("RGBA", "VECTOR"):
+                value = list(node[identifier])
+                for col in columns:
+                    value[self.parameters[col]["i_sub"]] = float(row[col])
+            elif kind == "INT":
+                value = int(row[columns[0]])
+            else:
+                value = float(row[columns[0]])
+            node[identifier] = value
+
+        return params
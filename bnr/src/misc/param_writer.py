@@ -0,0 +1,68 @@
+import json
+import sys
+
+import numpy as np
+
+from bnr.src.misc.jsonl import JsonlAppender, sorted_records, KEY_INDEX
+from bnr.src.misc.param_store import PARAM_SCHEMA_FILE, PARAM_VALUES_FILE
+
+PARAM_DATA_FILE = "param_data.json"
+PARAM_DATA_JSONL_FILE = "param_data.jsonl"
+LABELS_FILE = "normalized_data_labels.csv"
+
+KEY_PARAMS = "params"
+LABELS_CHUNK = 1 << 16  # Number of label rows that are written at once
+
+# Formats of the final parameter data file
+FORMAT_JSON = "JSON"  # param_data.json, a single dictionary of sample index -> parameters (as before)
+FORMAT_JSONL = "JSONL"  # Only param_data.jsonl, one {"index": ..., "params": ...} record per line
+FORMAT_MATRIX = "MATRIX"  # Only param_schema.json next to the design matrix, nothing is written per sample (see param_store)
+
+
+class ParamDataWriter:
+    """Streams the parameters of every sample to param_data.jsonl as soon as it is produced, so that memory use does not
+    grow with the number of samples."""
+
+    def __init__(self, filepath):
+        self._appender = JsonlAppender(filepath + PARAM_DATA_JSONL_FILE)
+
+    def open(self, resume=False):
+        self._appender.open(resume=resume)
+
+    def write(self, index, params: dict):
+        self._appender.append({KEY_INDEX: index, KEY_PARAMS: params})
+
+    def close(self):
+        self._appender.close()
+
+
+def write_param_data_json(filepath, records):
+    """Writes records (dictionaries with an index and params) as one JSON dictionary of index -> params, one entry at a time.
+    Every entry is written on its own line, which keeps the file readable by line based tools."""
+    with open(filepath, "w") as f:
+        f.write("{")
+        sep = "\n"
+        for record in records:
+            f.write("{}{}: {}".format(sep, json.dumps(str(record[KEY_INDEX])), json.dumps(record[KEY_PARAMS])))
+            sep = ",\n"
+        f.write("\n}")
+
+
+def write_labels(filepath, labels, indices: range):
+    """Writes the rows of a matrix of normalized labels (or the labels of a design) for the given sample indices to a CSV
+    file with one row per sample, LABELS_CHUNK rows at a time."""
+    with open(filepath, "w", newline="") as f:
+        for start in range(indices.start, indices.stop, LABELS_CHUNK):
+            np.savetxt(f, labels[start:min(start + LABELS_CHUNK, indices.stop)], fmt="%.8g", delimiter=",")
+    sys.stdout.write("Wrote labels to: {}\n".format(filepath))
+
+
+def write_param_data(filepath, indices: range, param_format=FORMAT_JSON):
+    """Converts the streamed param_data.jsonl in filepath to the final parameter data file, in sample index order."""
+    if param_format == FORMAT_MATRIX:
+        sys.stdout.write("Parameter data is stored in {} and {}\n".format(PARAM_SCHEMA_FILE, PARAM_VALUES_FILE))
+    elif param_format == FORMAT_JSON:
+        write_param_data_json(filepath + PARAM_DATA_FILE, sorted_records(filepath + PARAM_DATA_JSONL_FILE, indices))
+        sys.stdout.write("Wrote parameter data to: {}\n".format(filepath + PARAM_DATA_FILE))
+    else:
+        sys.stdout.write("Wrote parameter data to: {}\n".format(filepath + PARAM_DATA_JSONL_FILE))
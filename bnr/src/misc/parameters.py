@@ -3,6 +3,7 @@ import bpy
 import numpy as np
 from mathutils import Color
 from bnr.src.misc import misc
+from bnr.src.misc.color import wrap_hue
 from collections import abc
 
 def is_vector_type(input: bpy.types.NodeSocket):
@@ -75,10 +76,11 @@ def get_input_enabled(input, i_sub=-1):
     
     return input.input_enabled
 
-def set_random_color(input: bpy.types.NodeSocket, umin: list, umax: list, i_sub=-1):
+def set_random_color(input: bpy.types.NodeSocket, umin: list, umax: list, i_sub=-1, rng=random):
     """
     Calculates a random color based on the HSV ranges supplied in umin and umax. The value of the input will be set to this color. 
     If i_sub is supplied, only this index will be randomized, else all 3 channels will be randomized.
+    Values are drawn from rng, which can be the random module itself or a seeded random.Random instance.
     
         Returns:
             A list with 1 or 3 new HSV values, based on whether i_sub was supplied or not.
@@ -86,11 +88,11 @@ def set_random_color(input: bpy.types.NodeSocket, umin: list, umax: list, i_sub=
     assert i_sub < 3, "i_sub can not be greater than 2 as it corresponds to an index in a color vector (and alpha is not supported)!"
 
     if i_sub < 0:
-        val = [misc.color_clamp(random.normalvariate(umin.x, umax.x)), random.uniform(umin.y, umax.y), random.uniform(umin.z, umax.z)]
+        val = [float(wrap_hue(rng.normalvariate(umin.x, umax.x))), rng.uniform(umin.y, umax.y), rng.uniform(umin.z, umax.z)]
     elif i_sub in (1,2):
-        val = random.uniform(umin[i_sub], umax[i_sub])
+        val = rng.uniform(umin[i_sub], umax[i_sub])
     else:
-        val = misc.color_clamp(random.normalvariate(umin[i_sub], umax[i_sub]))  # Sample the Hue from a normal distribution
+        val = float(wrap_hue(rng.normalvariate(umin[i_sub], umax[i_sub])))  # Sample the Hue from a normal distribution
 
     rgb = hsv_to_rgb(input, val, i_sub=i_sub)
     input.default_value = rgb
@@ -98,6 +100,9 @@ def set_random_color(input: bpy.types.NodeSocket, umin: list, umax: list, i_sub=
     return val
 
 def hsv_to_rgb(input, val, i_sub=-1):
+    """Returns the RGBA value of a color input with its HSV channel i_sub (or all channels if i_sub is negative) set to val.
+    The single color of the input is converted with mathutils.Color (designs convert whole arrays of colors with
+    bnr.src.misc.color.hsv_to_rgb instead)."""
     c = Color(input.default_value[:3])
 
     if i_sub == 0:
@@ -111,10 +116,11 @@ def hsv_to_rgb(input, val, i_sub=-1):
 
     return [*c[:], 1.0]  # Return RGB values
 
-def set_random_vector(input: bpy.types.NodeSocket, umin:list, umax:list, i_sub=-1):
+def set_random_vector(input: bpy.types.NodeSocket, umin:list, umax:list, i_sub=-1, rng=random):
     """
     Calculates a list of random values based on the ranges supplied in umin and umax. The value of the input will be set to this list.
     If i_sub is supplied, only this index will be randomized, else all 3 values will be randomized.
+    Values are drawn from rng, which can be the random module itself or a seeded random.Random instance.
     
         Returns:
             A list with 1 or 3 random values, based on whether i_sub was supplied or not.
@@ -122,20 +128,21 @@ def set_random_vector(input: bpy.types.NodeSocket, umin:list, umax:list, i_sub=-
     assert i_sub < 3, "i_sub can not be greater than 2 as it corresponds to an index in a vector (and Blender only has 3D vectors)."
 
     if i_sub < 0:
-        val = [random.uniform(umin.x, umax.x), random.uniform(umin.y, umax.y), random.uniform(umin.z, umax.z)]
+        val = [rng.uniform(umin.x, umax.x), rng.uniform(umin.y, umax.y), rng.uniform(umin.z, umax.z)]
         input.default_value = val
     else:
-        val = random.uniform(umin[i_sub], umax[i_sub])
+        val = rng.uniform(umin[i_sub], umax[i_sub])
         input.default_value[i_sub] = val
 
     return val
 
-def set_random_value_for_input(input: bpy.types.NodeSocket, i_sub = -1):
+def set_random_value_for_input(input: bpy.types.NodeSocket, i_sub = -1, rng=random):
     """
     Sets a new random value for an input based on its type.
 
     Arguments:
         input - A NodeSocket with property group 'user_props'
+        rng - The random module or a seeded random.Random instance to draw the value from
         
     Returns:
         The normalized label corresponding to the randomized value (or values if vector type) as a list
@@ -145,29 +152,24 @@ def set_random_value_for_input(input: bpy.types.NodeSocket, i_sub = -1):
     umax = input.user_props.user_max
 
     if input.type == "RGBA":
-        val = set_random_color(input, umin, umax, i_sub=i_sub)
+        val = set_random_color(input, umin, umax, i_sub=i_sub, rng=rng)
     elif input.type == "VECTOR":
-        val = set_random_vector(input, umin, umax, i_sub=i_sub)
+        val = set_random_vector(input, umin, umax, i_sub=i_sub, rng=rng)
     elif input.type == "VALUE":
-        val = random.uniform(umin, umax)
+        val = rng.uniform(umin, umax)
         input.default_value = val
     elif input.type == "INT":
-        val = random.randint(umin, umax)
+        val = rng.randint(umin, umax)
         input.default_value = val
     else:
         raise TypeError("Input of type {} not supported!".format(input.type))
 
-    normalized_lbl = []
-    umin = misc.list_(umin)
-    umax = misc.list_(umax)
-    val = misc.list_(val)
+    umin = np.array(misc.list_(umin), dtype=np.float64)
+    umax = np.array(misc.list_(umax), dtype=np.float64)
     if i_sub >= 0:
-        normalized_lbl.append(misc.normalize(val[0], umin[i_sub], umax[i_sub])) 
-    else:
-        for x in range(len(val)):
-            normalized_lbl.append(misc.normalize(val[x], umin[x], umax[x]))
+        umin, umax = umin[i_sub], umax[i_sub]
 
-    return normalized_lbl
+    return misc.normalize(np.array(misc.list_(val), dtype=np.float64), umin, umax).tolist()
 
 def linspace(input: bpy.types.NodeSocket, n:int, i_sub=-1) -> np.ndarray:
     """
@@ -181,7 +183,14 @@ def linspace(input: bpy.types.NodeSocket, n:int, i_sub=-1) -> np.ndarray:
         umin = input.user_props.user_min
         umax = input.user_props.user_max
 
-    if input.type == "RGBA" and i_sub == 0:  # Only the Hue of a color is not represented by a normal linspace
+    return linspace_range(umin, umax, n, is_hue=input.type == "RGBA" and i_sub == 0)
+
+def linspace_range(umin, umax, n: int, is_hue=False):
+    """
+    Generates a linspace of length n for a parameter with user set minimum and maximum (see linspace).
+    For the hue of a color, umin and umax are the mean and standard deviation of its normal distribution.
+    """
+    if is_hue:  # Only the Hue of a color is not represented by a normal linspace
         mu = umin
         std = umax
         mi, ma = mu-2*std, mu + 2*std # Capture 95% of values sampled from normal dist
@@ -190,6 +199,5 @@ def linspace(input: bpy.types.NodeSocket, n:int, i_sub=-1) -> np.ndarray:
         return np.linspace(umin, umax, num=n, endpoint=True)
 
 def linspace_color(start, end, n: int):
-    lin = np.linspace(start, end, num=n, endpoint=True)
-    return [misc.color_clamp(x) for x in lin]
+    return wrap_hue(np.linspace(start, end, num=n, endpoint=True))
         
@@ -0,0 +1,423 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from bpy import ops
+
+from bnr.src.misc.adaptive import AdaptiveDesign
+from bnr.src.misc.atlas import Atlas
+from bnr.src.misc.batch import KeyframeBatch, BATCH_DIR, batches, render_batch, remove_batch_dir
+from bnr.src.misc.binding import BindingPlan
+from bnr.src.misc.capture import setup_capture, remove_capture, render_to_array, check_display_settings
+from bnr.src.misc.design import GridDesign, ParameterDesign, ParameterTable, write_design_meta
+from bnr.src.misc.encoder import EncoderPool, DirectoryStore, IMAGE_FORMATS
+from bnr.src.misc.job import RenderJob
+from bnr.src.misc.journal import Journal, JOURNAL_FILE, file_checksum, pixel_checksum
+from bnr.src.misc.manifest import Manifest
+from bnr.src.misc.memmap_store import MemmapDataset, OUTPUT_MEMMAP, COLOR_MODE_CHANNELS, DTYPE_UINT8
+from bnr.src.misc.ordering import RenderTimes, RENDER_TIMES_FILE, recompile_aware_order
+from bnr.src.misc.profiles import apply_profile
+from bnr.src.misc.render_cache import RenderCache, RenderKeys
+from bnr.src.misc.param_store import write_param_schema
+from bnr.src.misc.param_writer import ParamDataWriter, write_param_data, write_labels, LABELS_FILE, FORMAT_MATRIX
+from bnr.src.misc.strategies import make_strategy, STRATEGY_ADAPTIVE, STRATEGY_GRID
+from bnr.src.misc.tar_store import TarShardStore, OUTPUT_TAR
+from bnr.src.misc.scene_setup import get_standard_scene
+from bnr.src.misc.time import seconds_to_complete_time
+from bnr.src.misc.to_json import node_params_min_max_to_json, node_params_to_json
+from bnr.src.operators.eliminate_parameters import eliminate_parameters
+from bnr.src.operators.parameter_setup import load_parameter_setup
+
+PARAMETER_SETUP_FILE = "parameter_setup.json"
+
+
+def setup_render_settings(scene, job: RenderJob):
+    render = scene.render
+    render.resolution_x = job.x_res
+    render.resolution_y = job.y_res
+    render.resolution_percentage = 100
+    apply_profile(scene, job.profile)
+
+
+def prepare_scene(job: RenderJob, source_scene, material):
+    """Sets up the scene that the job is rendered in and eliminates parameters if the job asks for it.
+    The resulting parameter setup is saved to the output directory. When resuming a job, that setup is loaded again instead,
+    so that the remaining samples are rendered with exactly the same enabled parameters and ranges.
+
+    Returns:
+        The scene to render
+    """
+    nodes = material.node_tree.nodes
+    setup_path = job.metadata_dir + PARAMETER_SETUP_FILE
+
+    # Render in a separate standard scene, so that the source scene is never manipulated
+    scene = get_standard_scene(source_scene, material) if job.use_standard_setup else source_scene
+    setup_render_settings(scene, job)
+
+    if job.resume and os.path.exists(setup_path):
+        with open(setup_path, "r") as f:
+            load_parameter_setup(json.load(f), nodes)
+        return scene
+
+    # ==== Eliminate parameters automatically ====
+    if job.eliminate_parameters:
+        pe_props = scene.pe_props
+        pe_props.norm_thresh = 2.0
+        eliminate_parameters(nodes, scene, pe_props, save_renders=source_scene.props.debug_mode, seed=job.seed,
+                             cache=open_render_cache(job))
+
+    os.makedirs(job.metadata_dir, exist_ok=True)
+    with open(setup_path, "w") as f:
+        json.dump(node_params_to_json(nodes), f)
+
+    return scene
+
+
+def open_render_cache(job: RenderJob):
+    """Returns the render cache of the job, or None if the job does not use one."""
+    return RenderCache(job.cache_dir, job.cache_size) if job.cache else None
+
+
+def write_param_min_max(filepath, nodes):
+    """Save parameter mins and maxes (so that we can normalize them later)"""
+    with open(filepath + "param_min_max.json", "w") as f:
+        data = node_params_min_max_to_json(nodes)
+        json.dump(data, f)
+
+
+def load_or_create_design(job: RenderJob, plan: BindingPlan):
+    """Returns the design matrix of the job, as produced by its permutation strategy (see bnr.src.misc.strategies).
+    The number of samples of the job is set to the number of samples of the strategy.
+
+    A design that already exists in the output directory is reused when resuming, and by the workers of a sharded job
+    (whose design is created up front by the launching process). The rows of an adaptive design are placed while the job
+    runs, so its design is loaded writable. The design of a grid is never stored, its rows are decoded from the sample
+    index whenever they are needed (see GridDesign)."""
+    strategy = make_strategy(job.strategy, plan.table, plan.defaults(), job.render_amount, job.seed, sampler=job.sampler,
+                             grid_levels=job.grid_levels)
+    job.set_sample_count(strategy.count())
+
+    if job.strategy == STRATEGY_GRID:
+        if job.worker_id is None:
+            os.makedirs(job.output_dir, exist_ok=True)
+            write_design_meta(strategy, job.output_dir)
+        return GridDesign(strategy)
+
+    if (job.resume or job.worker_id is not None) and ParameterDesign.exists(job.output_dir):
+        design = ParameterDesign.load(plan.table, job.output_dir, mode="r+" if job.strategy == STRATEGY_ADAPTIVE else "r")
+        if len(design) != job.render_amount:
+            raise ValueError("The design in {} has {} samples, but the job renders {}!".format(job.output_dir, len(design), job.render_amount))
+        return design
+
+    os.makedirs(job.output_dir, exist_ok=True)
+    return ParameterDesign.generate(strategy, job.output_dir)
+
+
+def open_memmap_dataset(job: RenderJob, color_mode, parameters) -> MemmapDataset:
+    """Returns the image and label arrays of a job with the "MEMMAP" output format. Like the design, existing arrays are
+    reused when resuming and by the workers of a sharded job, which all fill their own rows of the same arrays."""
+    if (job.resume or job.worker_id is not None) and MemmapDataset.exists(job.output_dir):
+        dataset = MemmapDataset.open(job.output_dir)
+        if len(dataset) != job.render_amount:
+            raise ValueError("The arrays in {} have {} samples, but the job renders {}!".format(job.output_dir, len(dataset), job.render_amount))
+        return dataset
+
+    return MemmapDataset.create(job.output_dir, job.render_amount, job.y_res, job.x_res, COLOR_MODE_CHANNELS[color_mode],
+                                parameters, dtype=job.memmap_dtype)
+
+
+def open_manifest(job: RenderJob) -> Manifest:
+    """Returns the manifest of the job (see bnr.src.misc.manifest), with records up to the last sample the job renders. Like
+    the design, an existing manifest is reused when resuming and by the workers of a sharded job."""
+    if (job.resume or job.worker_id is not None) and Manifest.exists(job.output_dir):
+        manifest = Manifest.open(job.output_dir)
+        if len(manifest) < job.end_index:
+            raise ValueError("The manifest in {} has {} samples, but the job renders up to sample {}!".format(job.output_dir, len(manifest), job.end_index))
+        return manifest
+
+    return Manifest.create(job.output_dir, job.end_index)
+
+
+def displays_captures(job: RenderJob) -> bool:
+    """Returns whether the captured renders of a job are converted to display values (8 bit images and arrays, and the
+    thumbnails of adaptive designs), which only matches Blender's own output for the Standard view transform."""
+    if job.strategy == STRATEGY_ADAPTIVE:
+        return True
+    if not job.write_images:
+        return False
+    if job.output_format == OUTPUT_MEMMAP:
+        return job.memmap_dtype == DTYPE_UINT8
+
+    return job.image_format != "NPY"
+
+
+def bind_material(nodes) -> BindingPlan:
+    """Returns the binding plan of the enabled parameters of a material's nodes."""
+    return BindingPlan(nodes, ParameterTable(node_params_min_max_to_json(nodes)))
+
+
+def check_atlas_setup(job: RenderJob):
+    """Makes sure that the atlas of a job can be rendered: its tiles reproduce the view of the standard setup.
+
+    Raises:
+        ValueError if the job renders an atlas without the standard setup
+    """
+    if job.atlas > 1 and not job.use_standard_setup:
+        raise ValueError("Atlas rendering needs the standard setup, turn on Use Standard Setup or set the atlas size to 1")
+
+
+def run_render_job(job: RenderJob, source_scene, material, consumer=None):
+    """Renders a dataset as described by job. Does not depend on any panel or window context, so this can be run both from
+    NODE_OP_Render and from a Blender instance running in background mode (see bnr.cli).
+
+    All parameter values are drawn up front into a design matrix (see bnr.src.misc.design), rendering sample r only
+    applies row r of it to the enabled sockets, which are resolved once per job (see bnr.src.misc.binding). Only the
+    samples in job.indices are rendered, images are named by their global sample index so that the workers of a
+    sharded job can all write to the same output directory. Every rendered sample is recorded in a journal right away (see
+    bnr.src.misc.journal), so if job.resume is set, samples that were completed by an earlier, interrupted run are skipped.
+
+    Arguments:
+        job -- The job to run
+        source_scene -- The scene to render, or to base the standard setup on if job.use_standard_setup is set
+        material -- The material whose node parameters are varied
+        consumer -- If set (and job.capture or job.atlas is set), called as consumer(index, pixels, labels) with the float32 RGBA
+                    pixels of every render (see bnr.src.misc.capture.render_to_array)
+
+    Raises:
+        ValueError if the job renders an atlas without the standard setup, whose view the tiles reproduce
+    """
+    check_atlas_setup(job)
+    scene = prepare_scene(job, source_scene, material)
+    render = scene.render
+    nodes = material.node_tree.nodes
+    adaptive = job.strategy == STRATEGY_ADAPTIVE
+    # Atlas renders are sliced in memory, adaptive designs compare renders, tar shards and arrays are written from memory
+    capture = job.capture or job.atlas > 1 or adaptive or job.output_format in (OUTPUT_TAR, OUTPUT_MEMMAP)
+    if capture and displays_captures(job):
+        check_display_settings(scene)
+
+    # Initialize render variables
+    FILEPATH = job.output_dir
+    METADATA_PATH = job.metadata_dir
+    FILE_EXTENSION = IMAGE_FORMATS[job.image_format] if capture else render.file_extension
+
+    os.makedirs(METADATA_PATH, exist_ok=True)
+    write_param_min_max(METADATA_PATH, nodes)
+    plan = bind_material(nodes)
+    design = load_or_create_design(job, plan)  # Sets the number of samples, so job.indices are only known from here on
+    adaptive = AdaptiveDesign(design, METADATA_PATH, resume=job.resume) if adaptive else None
+    manifest = open_manifest(job)
+    if job.param_format == FORMAT_MATRIX and job.worker_id is None:  # Written by the launching process for sharded jobs
+        write_param_schema(FILEPATH, plan, levels=design.levels)
+
+    journal = Journal(METADATA_PATH + JOURNAL_FILE)
+    completed = journal.completed(FILEPATH) if job.resume else set()
+    indices = [r for r in job.indices if r not in completed]
+    N = len(indices)
+    rendered = 0
+
+    if job.reorder and not adaptive:  # The rows of later adaptive rounds are not known yet
+        indices = recompile_aware_order(scene, plan, design.values, indices)
+
+    if completed:
+        sys.stdout.write("===== RESUMING RENDERING JOB ({} already rendered) =====\n".format(len(completed)))
+    sys.stdout.write("===== STARTING RENDERING JOB ({}, seed {}, {} strategy, {} sampling) =====\n".format(N, design.seed, design.strategy, design.sampler))
+
+    atlas = None
+    capture_state = None
+    if job.atlas > 1:
+        atlas = Atlas(scene, material, job.atlas, job.x_res, job.y_res)
+        apply_profile(atlas.scene, job.profile)
+        atlas_plans = [BindingPlan(m.node_tree.nodes, design.table) for m in atlas.materials]
+        setup_capture(atlas.scene)  # The atlas scene is removed after the job
+    elif capture:
+        capture_state = setup_capture(scene)
+
+    start_time = time.time()
+    render_time = 0.0
+    param_writer = ParamDataWriter(METADATA_PATH) if job.param_format != FORMAT_MATRIX else None
+    if param_writer:
+        param_writer.open(resume=job.resume)
+    journal.open(resume=job.resume)
+    render_times = RenderTimes(METADATA_PATH + RENDER_TIMES_FILE)
+    render_times.open(resume=job.resume)
+    encoder = None
+    dataset = None
+    if capture and job.write_images and job.output_format == OUTPUT_MEMMAP:
+        dataset = open_memmap_dataset(job, render.image_settings.color_mode, len(design.table))
+    elif capture and job.write_images:
+        if job.output_format == OUTPUT_TAR:
+            store = TarShardStore(FILEPATH, FILE_EXTENSION, METADATA_PATH, shard_size=job.tar_shard_size,
+                                  worker_id=job.worker_id, resume=job.resume, manifest=manifest)
+        else:
+            store = DirectoryStore(FILEPATH, FILE_EXTENSION)
+        encoder = EncoderPool(store, image_format=job.image_format,
+                              color_mode=render.image_settings.color_mode, threads=job.encoder_threads,
+                              max_queued=job.encoder_queue)
+
+    lock = threading.Lock()
+
+    def complete(r, pd, rl, filepath=None, checksum=None):
+        """Records a sample once its image has been written (called from the encoder threads when encoding in the background)."""
+        with lock:
+            checksum = checksum or file_checksum(filepath)
+            if param_writer:
+                param_writer.write(r, pd)
+            journal.append(r, rl, filepath=filepath, checksum=checksum)
+            manifest.complete(r, checksum, filepath=filepath, worker_id=job.worker_id)
+
+    def captured(r, pixels, pd, rl):
+        """Hands the captured pixels of a sample to the consumer, the adaptive design and the encoder (or the arrays)."""
+        if adaptive:
+            adaptive.observe(r, pixels)
+        if consumer:
+            consumer(r, pixels, rl)
+        if dataset:
+            dataset.write(r, pixels, rl)
+        if encoder:
+            encoder.submit(r, pixels, on_done=lambda path, checksum: complete(r, pd, rl, path, checksum),
+                           records={"labels": rl, "params": pd})
+        else:
+            complete(r, pd, rl, checksum=pixel_checksum(pixels))
+
+    # Atlas renders are not cached, as their tiles are rendered together
+    cache = open_render_cache(job) if not atlas else None
+    keys = RenderKeys(material.node_tree, scene) if cache else None
+
+    # Keyframe batches of samples and render each batch with one animation render (captured renders are read one at a time),
+    # an atlas renders one batch of samples per render as its tiles
+    batch = None
+    if atlas:
+        batch_size = len(atlas)
+    elif job.batch_size > 1 and not capture:
+        batch_size = job.batch_size
+        batch = KeyframeBatch(plan, material.node_tree)
+    else:
+        batch_size = 1
+    batch_dir = os.path.join(METADATA_PATH, BATCH_DIR, "")
+
+    # The rows of every adaptive round are placed once the samples of the previous rounds are rendered
+    rounds = adaptive.rounds(indices) if adaptive else [indices]
+
+    try:
+        for chunk in (c for round_indices in rounds for c in batches(round_indices, batch_size)):
+            if atlas:
+                # Tiles beyond the last sample of a partial atlas are rendered, but discarded
+                for t, r in enumerate(chunk):
+                    atlas_plans[t].apply(design.values[r])
+                render_start = time.time()
+                pixels = render_to_array(atlas.scene)
+                sample_time = time.time() - render_start
+                for t, r in enumerate(chunk):
+                    captured(r, atlas.tile(pixels, t), atlas_plans[t].values_to_json(design.values[r]), design.labels[r].tolist())
+            elif batch:
+                # Samples that are cached are copied, only the others are keyframed and rendered
+                missing = []
+                for r in chunk:
+                    pd = plan.values_to_json(design.values[r])
+                    filename = "{}{}{}".format(FILEPATH, r, FILE_EXTENSION)
+                    key = keys.for_values(pd) if cache else None
+                    if cache and cache.copy_to(key, FILE_EXTENSION, filename):
+                        complete(r, pd, design.labels[r].tolist(), filepath=filename)
+                    else:
+                        missing.append((r, pd, filename, key))
+
+                sample_time = 0.0
+                if missing:
+                    batch.bake(design.values[[m[0] for m in missing]])
+                    render_start = time.time()
+                    frames = render_batch(scene, len(missing), batch_dir)
+                    sample_time = time.time() - render_start
+                for (r, pd, filename, key), frame in zip(missing, frames if missing else []):
+                    os.replace(frame, filename)
+                    if cache:
+                        cache.put_file(key, FILE_EXTENSION, filename)
+                    complete(r, pd, design.labels[r].tolist(), filepath=filename)
+            else:
+                r = chunk[0]
+                plan.apply(design.values[r])
+                pd = plan.values_to_json(design.values[r])
+                rl = design.labels[r].tolist()
+                key = keys.for_values(pd) if cache else None
+
+                sample_time = 0.0
+                if capture:
+                    pixels = cache.load_pixels(key) if cache else None
+                    if pixels is None:
+                        render_start = time.time()
+                        pixels = render_to_array(scene)
+                        sample_time = time.time() - render_start
+                        if cache:
+                            cache.put_pixels(key, pixels)
+                    captured(r, pixels, pd, rl)
+                else:
+                    filename = "{}{}{}".format(FILEPATH, r, FILE_EXTENSION)
+                    if not (cache and cache.copy_to(key, FILE_EXTENSION, filename)):
+                        render.filepath = filename
+                        render_start = time.time()
+                        ops.render.render(write_still=True, scene=scene.name)
+                        sample_time = time.time() - render_start
+                        if cache:
+                            cache.put_file(key, FILE_EXTENSION, filename)
+                    complete(r, pd, rl, filepath=filename)
+
+            rendered += len(chunk)
+            render_time += sample_time
+            render_times.log(chunk, sample_time)
+            manifest.log(chunk, sample_time)
+
+            # Print progress information
+            passed_time = time.time() - start_time
+            avg_sample_time = "{}h {}m {:.2f}s".format(*seconds_to_complete_time((passed_time / rendered) * (N - rendered)))
+            passed_time = "{}h {}m {:.2f}".format(*seconds_to_complete_time(passed_time))
+            msg = "Rendered image {} of {}".format(rendered, N)
+            sys.stdout.write(
+                "{} [Elapsed: {}][Remaining: {}][Render: {:.3f}s]\n".format(
+                    msg, passed_time, avg_sample_time, sample_time
+                )
+            )
+            sys.stdout.flush()
+    finally:
+        try:
+            if encoder:
+                try:
+                    encoder.close()  # Wait for the queued images, so that they are journaled
+                finally:
+                    encoder.store.close()
+        finally:
+            if batch:
+                batch.clear()
+                remove_batch_dir(batch_dir)
+            if atlas:
+                atlas.remove()
+            if capture_state:
+                remove_capture(scene, capture_state)
+            if dataset:
+                dataset.flush()
+            manifest.flush()
+            if param_writer:
+                param_writer.close()
+            journal.close()
+            render_times.close()
+
+    write_param_data(METADATA_PATH, job.indices, param_format=job.param_format)
+    write_labels(METADATA_PATH + LABELS_FILE, design.labels, job.indices)
+
+    total_time = time.time() - start_time
+    sys.stdout.write(
+        "Total Time: {}h {}m {:.2f}s [Avg per render: {:.3f}s]\n".format(
+            *seconds_to_complete_time(total_time), total_time / max(N, 1)
+        )
+    )
+    sys.stdout.write("Render Time: {:.2f}s [Avg per render: {:.3f}s]\n".format(render_time, render_time / max(N, 1)))
+    if cache:
+        sys.stdout.write("Render Cache: {} hits, {} misses\n".format(cache.hits, cache.misses))
+    if encoder:
+        sys.stdout.write(
+            "Encode Time: {:.2f}s, Write Time: {:.2f}s (summed over {} threads) [Render loop blocked on encoding: {:.2f}s]\n".format(
+                encoder.encode_time, encoder.write_time, job.encoder_threads, encoder.wait_time
+            )
+        )
+
@@ -0,0 +1,66 @@
+"""Named render quality profiles. A profile sets the render engine and everything that trades render time for quality, so that
+a dataset can be rendered with the cheapest profile that is still good enough (see bnr.src.misc.benchmark)."""
+
+KEY_ENGINE = "engine"
+KEY_SAMPLES = "samples"
+KEY_DENOISE = "denoise"
+KEY_THREADS = "threads"  # 0 detects the number of threads automatically
+KEY_TILE = "tile"  # Tile size in pixels (Cycles)
+KEY_VIEW_TRANSFORM = "view_transform"
+
+PROFILE_DEFAULT = "DEFAULT"
+
+PROFILES = {
+    # Only selects EEVEE and keeps all other settings of the scene (the behaviour before profiles existed)
+    PROFILE_DEFAULT: {KEY_ENGINE: "BLENDER_EEVEE"},
+    "DRAFT": {KEY_ENGINE: "BLENDER_EEVEE", KEY_SAMPLES: 4, KEY_THREADS: 0, KEY_VIEW_TRANSFORM: "Standard"},
+    "DATASET": {KEY_ENGINE: "BLENDER_EEVEE", KEY_SAMPLES: 32, KEY_THREADS: 0, KEY_VIEW_TRANSFORM: "Standard"},
+    "FINAL": {KEY_ENGINE: "CYCLES", KEY_SAMPLES: 256, KEY_DENOISE: True, KEY_THREADS: 0, KEY_TILE: 64,
+              KEY_VIEW_TRANSFORM: "Standard"},
+}
+
+# Profiles from cheapest to highest quality, the last one is the reference of a benchmark
+PROFILE_ORDER = ["DRAFT", "DATASET", "FINAL"]
+
+PROFILE_ITEMS = [
+    (PROFILE_DEFAULT, "Default", "EEVEE with the sample and color settings of the scene"),
+    ("DRAFT", "Draft", "EEVEE with 4 samples, for previews"),
+    ("DATASET", "Dataset", "EEVEE with 32 samples"),
+    ("FINAL", "Final", "Cycles with 256 denoised samples, the highest quality"),
+]
+
+
+def apply_profile(scene, name=PROFILE_DEFAULT):
+    """Applies the settings of a render profile to a scene. Settings that the profile does not name are left unchanged.
+
+    Raises:
+        KeyError if there is no profile with that name
+    """
+    profile = PROFILES[name]
+    render = scene.render
+    render.engine = profile[KEY_ENGINE]
+
+    if KEY_SAMPLES in profile:
+        if render.engine == "CYCLES":
+            scene.cycles.samples = profile[KEY_SAMPLES]
+        else:
+            scene.eevee.taa_render_samples = profile[KEY_SAMPLES]
+
+    if KEY_DENOISE in profile and render.engine == "CYCLES":
+        for view_layer in scene.view_layers:
+            view_layer.cycles.use_denoising = profile[KEY_DENOISE]
+
+    if KEY_THREADS in profile:
+        render.threads_mode = "AUTO" if profile[KEY_THREADS] == 0 else "FIXED"
+        if profile[KEY_THREADS] > 0:
+            render.threads = profile[KEY_THREADS]
+
+    if KEY_TILE in profile:
+        render.tile_x = profile[KEY_TILE]
+        render.tile_y = profile[KEY_TILE]
+
+    if KEY_VIEW_TRANSFORM in profile:
+        scene.view_settings.view_transform = profile[KEY_VIEW_TRANSFORM]
+        scene.view_settings.look = "None"
+        scene.view_settings.exposure = 0
+        scene.view_settings.gamma = 1
@@ -0,0 +1,239 @@
+"""Content addressed cache of renders. Every render is stored under a hash of everything that determines how it looks: the
+structure of the material's node tree, the values of all its sockets (quantized, so that float noise does not cause misses),
+all render settings and the objects of the scene (with the settings of their lights and cameras). Re-rendering identical
+parameters (e.g. after a small range tweak, or when parameter elimination is run again with the same seed) then only costs a
+file copy.
+
+The cache is bounded in size, the least recently used renders are evicted first.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import bpy
+import numpy as np
+
+from bnr.src.misc.scene_setup import get_render_settings
+from bnr.src.misc.to_json import node_values_to_json
+
+CACHE_DIR = str(Path.home() / ".cache" / "bnr" / "renders")
+CACHE_SIZE_MB = 1024
+QUANTIZE_DIGITS = 5  # Socket values are rounded to this many decimals before hashing
+PIXELS_EXTENSION = ".npy"
+
+# Node properties that only affect the node editor, not the render
+_UI_PROPERTIES = {"rna_type", "name", "label", "location", "width", "width_hidden", "height", "dimensions", "parent", "select",
+                  "hide", "mute", "show_options", "show_preview", "show_texture", "use_custom_color", "color", "inputs",
+                  "outputs", "internal_links", "type", "bl_idname", "bl_label", "bl_description", "bl_icon", "bl_static_type",
+                  "bl_width_default", "bl_width_min", "bl_width_max", "bl_height_default", "bl_height_min", "bl_height_max"}
+# Data block properties that do not affect the render (the name of a data block is part of its object's signature)
+_ID_PROPERTIES = {"rna_type", "name", "use_fake_user", "tag"}
+
+
+def quantize(value):
+    """Rounds all floats in a JSON compatible value to QUANTIZE_DIGITS decimals."""
+    if isinstance(value, float):
+        return round(value, QUANTIZE_DIGITS)
+    if isinstance(value, (list, tuple)):
+        return [quantize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: quantize(v) for k, v in value.items()}
+    return value
+
+
+def _rna_value(value):
+    """Converts the value of a non pointer RNA property to something JSON compatible."""
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    if isinstance(value, set):  # Enum flags
+        return sorted(value)
+    return [_rna_value(v) for v in value]
+
+
+def node_settings(node) -> dict:
+    """Returns the settings of a node that are not sockets, like its blend type or its image."""
+    settings = {"type": node.bl_idname}
+    for p in node.bl_rna.properties:
+        if p.identifier in _UI_PROPERTIES or p.type == "COLLECTION":
+            continue
+
+        value = getattr(node, p.identifier)
+        if p.type == "POINTER":
+            # Only data blocks are identified (by name), structs like texture mappings are skipped
+            if isinstance(value, bpy.types.ID):
+                settings[p.identifier] = value.name
+        elif not p.is_readonly:
+            settings[p.identifier] = _rna_value(value)
+
+    if getattr(node, "node_tree", None):
+        settings["node_tree"] = node_tree_signature(node.node_tree)
+    if getattr(node, "image", None):
+        settings["image_file"] = node.image.filepath
+    if getattr(node, "color_ramp", None):
+        ramp = node.color_ramp
+        settings["color_ramp"] = [ramp.interpolation, ramp.color_mode, [[e.position, list(e.color)] for e in ramp.elements]]
+    if getattr(node, "mapping", None) and hasattr(node.mapping, "curves"):
+        settings["curves"] = [[list(p.location) for p in c.points] for c in node.mapping.curves]
+
+    return settings
+
+
+def node_tree_signature(node_tree) -> dict:
+    """Returns the structure of a node tree: the type and settings of every node and all links (socket values are not included,
+    see node_values_to_json). Group nodes include the signature of their node tree."""
+    nodes = {n.name: node_settings(n) for n in node_tree.nodes}
+    links = sorted([l.from_node.name, l.from_socket.identifier, l.to_node.name, l.to_socket.identifier] for l in node_tree.links)
+    return quantize({"nodes": nodes, "links": links})
+
+
+def data_settings(struct) -> dict:
+    """Returns the settings of a data block, like the energy and color of a light or the lens and clipping of a camera: all
+    properties that are not collections, with nested structs (like the depth of field of a camera) included recursively,
+    other data blocks by name and the signature of its node tree if it uses nodes."""
+    settings = {}
+    for p in struct.bl_rna.properties:
+        if p.identifier in _ID_PROPERTIES or p.type == "COLLECTION":
+            continue
+
+        value = getattr(struct, p.identifier)
+        if p.type == "POINTER":
+            if isinstance(value, bpy.types.ID):
+                settings[p.identifier] = value.name
+            elif value is not None:
+                settings[p.identifier] = data_settings(value)
+        elif not p.is_readonly:
+            settings[p.identifier] = _rna_value(value)
+
+    if getattr(struct, "use_nodes", False) and getattr(struct, "node_tree", None):
+        settings["node_tree"] = node_tree_signature(struct.node_tree)
+
+    return settings
+
+
+def scene_signature(scene) -> dict:
+    """Returns the render settings and the objects of a scene. All render settings are included (see
+    bnr.src.misc.scene_setup.render_settings), like the color depth and compression of the image format, except for the output
+    path, which is set per render."""
+    render_settings = get_render_settings(scene)
+    render_settings[0].pop("filepath", None)
+    settings = {
+        "render_settings": [{k: _rna_value(v) for k, v in values.items()} for values in render_settings],
+        "camera": scene.camera.name if scene.camera else None,
+        "world": node_tree_signature(scene.world.node_tree) if scene.world and scene.world.use_nodes else None,
+    }
+
+    objects = {}
+    for o in scene.objects:
+        obj = {"type": o.type, "matrix": [list(row) for row in o.matrix_world], "data": o.data.name if o.data else None,
+               "materials": [s.material.name if s.material else None for s in o.material_slots]}
+        if o.type in ("LIGHT", "CAMERA"):
+            obj["settings"] = data_settings(o.data)
+        objects[o.name] = obj
+    settings["objects"] = objects
+
+    return quantize(settings)
+
+
+def _digest(data) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class RenderKeys:
+    """Computes the cache keys of renders of one material in one scene. The node tree structure and the scene are hashed once,
+    when they change (like the material of a parameter elimination step), a new RenderKeys has to be created."""
+
+    def __init__(self, node_tree, scene):
+        self.static = _digest([node_tree_signature(node_tree), scene_signature(scene)])
+
+    def for_values(self, values: dict) -> str:
+        """Returns the key of a render with the given socket values (as returned by node_values_to_json)."""
+        return _digest([self.static, quantize(values)])
+
+    def for_nodes(self, nodes) -> str:
+        """Returns the key of a render with the current socket values of the nodes."""
+        return self.for_values(node_values_to_json(nodes))
+
+
+class RenderCache:
+    """A directory of renders, named by their key (see RenderKeys). Looking up a render marks it as recently used."""
+
+    def __init__(self, directory=None, max_mb=None):
+        """
+        Arguments:
+            directory -- The cache directory, CACHE_DIR if None
+            max_mb -- The maximum size of the cache in MB, CACHE_SIZE_MB if None
+        """
+        self.directory = directory or CACHE_DIR
+        self.max_bytes = (max_mb or CACHE_SIZE_MB) * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._size = sum(e.stat().st_size for e in os.scandir(self.directory) if e.is_file())
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def get(self, key, extension):
+        """Returns the path of a cached render, or None if it is not cached."""
+        path = self._path(key, extension)
+        try:
+            os.utime(path)  # The modification time is the time of last use
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return path
+
+    def copy_to(self, key, extension, filepath) -> bool:
+        """Copies a cached render to filepath. Returns false if it is not cached."""
+        path = self.get(key, extension)
+        if path is None:
+            return False
+
+        shutil.copyfile(path, filepath)
+        return True
+
+    def load_pixels(self, key):
+        """Returns the cached pixels of a captured render, or None if they are not cached."""
+        path = self.get(key, PIXELS_EXTENSION)
+        return None if path is None else np.load(path)
+
+    def put_file(self, key, extension, filepath):
+        """Adds a rendered file to the cache."""
+        path = self._path(key, extension)
+        tmp = path + ".tmp"
+        shutil.copyfile(filepath, tmp)
+        self._add(tmp, path)
+
+    def put_pixels(self, key, pixels: np.ndarray):
+        """Adds the pixels of a captured render to the cache."""
+        path = self._path(key, PIXELS_EXTENSION)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, pixels)
+        self._add(tmp, path)
+
+    def _add(self, tmp, path):
+        # Renaming makes the entry appear atomically, so concurrent jobs (like the workers of a sharded job) never read a partial file
+        self._size += os.path.getsize(tmp)
+        os.replace(tmp, path)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Removes the least recently used renders until the cache is at most 90% of its maximum size."""
+        entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".tmp")]
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        self._size = sum(e.stat().st_size for e in entries)
+        for e in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            try:
+                size = e.stat().st_size
+                os.remove(e.path)
+                self._size -= size
+            except FileNotFoundError:
+                pass  # Evicted by another job
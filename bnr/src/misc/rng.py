@@ -0,0 +1,108 @@
+"""Counter based random numbers: every number is a pure function of (seed, sample index, column), so any sample of a job can
+be regenerated on its own, and disjoint index ranges (like the shards of a job) never overlap or correlate."""
+import os
+
+import numpy as np
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+_FEISTEL_ROUNDS = 4
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    """The SplitMix64 finalizer, a bijective hash of 64 bit integers (overflow wraps around, as intended)."""
+    x = x + _GOLDEN
+    x = (x ^ (x >> np.uint64(30))) * _MIX1
+    x = (x ^ (x >> np.uint64(27))) * _MIX2
+    return x ^ (x >> np.uint64(31))
+
+
+def new_seed() -> int:
+    """Returns a random seed, for jobs that don't specify one."""
+    return int.from_bytes(os.urandom(4), "little")
+
+
+def counter_uniform(seed: int, indices: np.ndarray, columns: int, stream=0) -> np.ndarray:
+    """Returns uniform random numbers in the open interval (0,1), of shape (len(indices), columns).
+    Row i only depends on seed, indices[i] and stream.
+
+    Arguments:
+        indices -- The sample indices to generate rows for
+        stream -- Selects an independent sequence for the same seed and indices (for samplers that need more numbers)
+    """
+    with np.errstate(over="ignore"):
+        key = _splitmix64(np.array([seed & 0xFFFFFFFFFFFFFFFF], dtype=np.uint64) ^ (np.uint64(stream) << np.uint64(32)))
+        rows = _splitmix64(np.asarray(indices, dtype=np.uint64) ^ key)
+        cols = np.arange(columns, dtype=np.uint64)
+        h = _splitmix64(_splitmix64(rows[:, None] ^ (cols[None, :] * _GOLDEN)))
+
+    # Use the upper 53 bits as mantissa and shift by half a step, so that 0 and 1 are never returned
+    return ((h >> np.uint64(11)).astype(np.float64) + 0.5) * (1.0 / (1 << 53))
+
+
+def counter_permutation(seed: int, indices: np.ndarray, n: int, columns: int, stream=0) -> np.ndarray:
+    """Returns the positions of indices in random permutations of range(n), one independent permutation per column, of shape
+    (len(indices), columns). Like counter_uniform, row i only depends on seed, indices[i] and stream, so the permutations are
+    never stored: each is a keyed Feistel network on the smallest power of 4 that holds n, and positions outside of range(n)
+    are permuted again until they are inside (cycle walking, which keeps the mapping a permutation of range(n))."""
+    half_bits = max(1, (max(n - 1, 1).bit_length() + 1) // 2)
+    mask = np.uint64((1 << half_bits) - 1)
+    shift = np.uint64(half_bits)
+
+    with np.errstate(over="ignore"):
+        key = _splitmix64(np.array([seed & 0xFFFFFFFFFFFFFFFF], dtype=np.uint64) ^ (np.uint64(stream) << np.uint64(32)))
+        keys = _splitmix64(key ^ (np.arange(columns, dtype=np.uint64) * _GOLDEN))
+        x = np.repeat(np.asarray(indices, dtype=np.uint64)[:, None], columns, axis=1)
+        keys = np.broadcast_to(keys[None, :], x.shape)
+
+        todo = np.ones(x.shape, dtype=bool)
+        while np.any(todo):
+            v, k = x[todo], keys[todo]
+            left, right = v >> shift, v & mask
+            for r in range(_FEISTEL_ROUNDS):
+                left, right = right, left ^ (_splitmix64(right ^ k ^ (np.uint64(r) * _GOLDEN)) & mask)
+            x[todo] = (left << shift) | right
+            todo = x >= np.uint64(n)
+
+    return x.astype(np.int64)
+
+
+# Coefficients of Acklam's rational approximation of the inverse normal CDF (relative error < 1.15e-9)
+_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02, 1.383577518672690e+02,
+      -3.066479806614716e+01, 2.506628277459239e+00)
+_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02, 6.680131188771972e+01,
+      -1.328068155288572e+01)
+_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00, -2.549732539343734e+00,
+      4.374664141464968e+00, 2.938163982698783e+00)
+_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00)
+_P_LOW = 0.02425
+
+
+def _polyval(coefs, x):
+    result = np.zeros_like(x)
+    for c in coefs:
+        result = result * x + c
+    return result
+
+
+def norm_ppf(u: np.ndarray) -> np.ndarray:
+    """The inverse CDF of the standard normal distribution, for u in (0,1). Turns uniform numbers into normal ones."""
+    u = np.asarray(u, dtype=np.float64)
+    x = np.empty_like(u)
+
+    low = u < _P_LOW
+    high = u > 1 - _P_LOW
+    mid = ~(low | high)
+
+    q = np.sqrt(-2 * np.log(u[low]))
+    x[low] = _polyval(_C, q) / (_polyval(_D, q) * q + 1)
+
+    q = np.sqrt(-2 * np.log(1 - u[high]))
+    x[high] = -_polyval(_C, q) / (_polyval(_D, q) * q + 1)
+
+    q = u[mid] - 0.5
+    r = q * q
+    x[mid] = _polyval(_A, r) * q / (_polyval(_B, r) * r + 1)
+
+    return x
@@ -0,0 +1,125 @@
+"""Samplers that generate the uniform numbers of a design matrix (see bnr.src.misc.design).
+
+Plain random sampling covers the parameter space unevenly (samples clump together and leave holes), quasi-random sequences
+and Latin hypercubes cover it much more evenly with the same number of renders. Every sampler returns numbers in the open
+interval (0,1) with one column per parameter, which are transformed to parameter values afterwards (see design.uniform_to_values).
+"""
+import numpy as np
+
+from bnr.src.misc.rng import counter_permutation, counter_uniform
+
+SAMPLER_RANDOM = "RANDOM"
+SAMPLER_HALTON = "HALTON"
+SAMPLER_SOBOL = "SOBOL"
+SAMPLER_LHS = "LHS"
+
+SAMPLER_ITEMS = [
+    (SAMPLER_RANDOM, "Random", "Every parameter is drawn independently at random"),
+    (SAMPLER_HALTON, "Halton", "Randomly shifted Halton sequence, even coverage for any number of samples"),
+    (SAMPLER_SOBOL, "Sobol", "Scrambled Sobol sequence, even coverage (best for powers of two samples, needs SciPy)"),
+    (SAMPLER_LHS, "Latin Hypercube", "Every parameter range is split into one stratum per sample, each stratum is used once"),
+]
+
+_EPS = 2.0 ** -53  # Keeps numbers inside the open interval (0,1), so that inverse CDFs stay finite
+
+
+def primes(n) -> list:
+    """Returns the first n prime numbers."""
+    found = []
+    candidate = 2
+    while len(found) < n:
+        if all(candidate % p for p in found if p * p <= candidate):
+            found.append(candidate)
+        candidate += 1
+    return found
+
+
+def radical_inverse(indices: np.ndarray, base) -> np.ndarray:
+    """The van der Corput radical inverse of integer indices in a base (the digits are mirrored around the decimal point)."""
+    i = np.asarray(indices, dtype=np.int64).copy()
+    result = np.zeros(len(i), dtype=np.float64)
+    f = 1.0 / base
+    while np.any(i > 0):
+        result += f * (i % base)
+        i //= base
+        f /= base
+    return result
+
+
+class RandomSampler:
+    """Independent random numbers from the counter based generator (see bnr.src.misc.rng)."""
+
+    def __init__(self, seed, n, columns):
+        self.seed = seed
+        self.columns = columns
+
+    def sample(self, indices: np.ndarray) -> np.ndarray:
+        return counter_uniform(self.seed, indices, self.columns)
+
+
+class HaltonSampler:
+    """Halton sequence with one prime base per column and a random shift per column (Cranley-Patterson rotation).
+    Like random sampling, every point only depends on the seed and its index."""
+
+    def __init__(self, seed, n, columns):
+        self.bases = primes(columns)
+        self.shift = counter_uniform(seed, [0], columns, stream=1)[0]
+
+    def sample(self, indices: np.ndarray) -> np.ndarray:
+        u = np.empty((len(indices), len(self.bases)))
+        for c, base in enumerate(self.bases):
+            u[:, c] = radical_inverse(np.asarray(indices) + 1, base)  # Index 0 would be 0 in every base
+        return np.clip(np.mod(u + self.shift, 1.0), _EPS, 1 - _EPS)
+
+
+class SobolSampler:
+    """Scrambled Sobol sequence from scipy.stats.qmc (SciPy is installed along with scikit-learn, see README)."""
+
+    def __init__(self, seed, n, columns):
+        try:
+            from scipy.stats import qmc
+        except ImportError as e:
+            raise ImportError("The Sobol sampler needs SciPy 1.7 or newer (scipy.stats.qmc)") from e
+
+        self.engine = qmc.Sobol(d=columns, scramble=True, seed=seed) if columns else None  # SciPy needs a dimension
+
+    def sample(self, indices: np.ndarray) -> np.ndarray:
+        """Returns the points of a contiguous range of indices."""
+        if self.engine is None:
+            return np.empty((len(indices), 0))
+        self.engine.reset()
+        self.engine.fast_forward(int(indices[0]))
+        return np.clip(self.engine.random(len(indices)), _EPS, 1 - _EPS)
+
+
+class LatinHypercubeSampler:
+    """Latin hypercube of n samples: the range of every column is split into n equal strata, and a random permutation
+    assigns one stratum to every sample. Within its stratum a sample is placed at random. The permutations are computed
+    per sample index from the counter based generator (see rng.counter_permutation), so nothing is stored up front."""
+
+    def __init__(self, seed, n, columns):
+        self.seed = seed
+        self.n = n
+        self.columns = columns
+
+    def sample(self, indices: np.ndarray) -> np.ndarray:
+        strata = counter_permutation(self.seed, indices, self.n, self.columns, stream=3)
+        jitter = counter_uniform(self.seed, indices, self.columns, stream=2)
+        return (strata + jitter) / self.n
+
+
+SAMPLERS = {
+    SAMPLER_RANDOM: RandomSampler,
+    SAMPLER_HALTON: HaltonSampler,
+    SAMPLER_SOBOL: SobolSampler,
+    SAMPLER_LHS: LatinHypercubeSampler,
+}
+
+
+def make_sampler(name, seed, n, columns):
+    """Creates a sampler for a design of n samples with the given number of columns.
+
+    Raises:
+        KeyError if there is no sampler with that name
+    """
+    return SAMPLERS[name](seed, n, columns)
@@ -0,0 +1,205 @@
+import bpy
+from pathlib import Path
+
+import bnr
+
+SCENE_NAME = "RENDER_SCENE_TMP"
+HDRI_FILE = "sunflowers_2k.hdr"
+HDRI_PATH = str(Path(bnr.__file__).parent / "res" / HDRI_FILE)
+PLANE_NAME = "Rendering Plane"
+CAMERA_NAME = "Rendering Camera"
+
+
+def setup_HDRI_for_world(world):
+    world.use_nodes = True  # A new world has no node tree until nodes are enabled
+    world_node_tree = world.node_tree
+    nodes = world_node_tree.nodes
+    links = world_node_tree.links
+    x_start = 0
+    delta_x = -200
+
+    world_node_tree.nodes.clear()
+
+    # Create new nodes
+    node_world_output = nodes.new(type="ShaderNodeOutputWorld")
+    node_background = nodes.new(type="ShaderNodeBackground")
+    node_texture_env = nodes.new(type="ShaderNodeTexEnvironment")
+    node_mapping = nodes.new(type="ShaderNodeMapping")
+    node_texture_coord = nodes.new(type="ShaderNodeTexCoord")
+
+    # Move nodes
+    node_world_output.location.x = x_start
+    node_background.location.x = node_world_output.location.x + delta_x
+    node_texture_env.location.x = node_background.location.x + delta_x
+    node_mapping.location.x = node_texture_env.location.x + delta_x
+    node_texture_coord.location.x = node_texture_coord.location.x + delta_x
+
+    # Connect nodes
+    links.new(
+        node_world_output.inputs["Surface"], node_background.outputs["Background"]
+    )
+    links.new(node_background.inputs["Color"], node_texture_env.outputs["Color"])
+    links.new(node_texture_env.inputs["Vector"], node_mapping.outputs["Vector"])
+    links.new(node_mapping.inputs["Vector"], node_texture_coord.outputs["Generated"])
+
+    # Set node values
+    node_background.inputs["Strength"].default_value = 1.0
+    node_texture_env.image = load_HDRI()
+
+
+def load_HDRI():
+    """Returns the HDRI image, reusing the image datablock if it has been loaded before (the file is only read once)."""
+    return bpy.data.images.load(HDRI_PATH, check_existing=True)
+
+
+def delete_scene(scene):
+    """Deletes a scene together with all objects that are linked to it."""
+    for o in list(scene.collection.all_objects):
+        bpy.data.objects.remove(o)
+
+    bpy.data.scenes.remove(scene)
+
+
+def create_plane_mesh(name, size=2, crop=None):
+    """Creates a flat, UV mapped quad mesh with side length size, centered at origin (same as ops.mesh.primitive_plane_add).
+
+    If crop = (x_min, y_min, x_max, y_max) is given, only that part of the plane is created (clipped to the plane). Its UV
+    and generated texture coordinates are those that it has on the whole plane, so it shades like that part of the plane.
+    """
+    h = size / 2
+    x_min, y_min, x_max, y_max = crop if crop else (-h, -h, h, h)
+    x_min, y_min, x_max, y_max = max(x_min, -h), max(y_min, -h), min(x_max, h), min(y_max, h)
+    corners = [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)]
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata([(x, y, 0) for x, y in corners], [], [(0, 1, 2, 3)])
+
+    uv_layer = mesh.uv_layers.new(name="UVMap")
+    for loop, (x, y) in zip(uv_layer.data, corners):
+        loop.uv = ((x + h) / size, (y + h) / size)
+
+    if crop:
+        # The automatic texture space of the whole plane (Blender gives its flat axis a size of 1)
+        mesh.use_auto_texspace = False
+        mesh.texspace_location = (0, 0, 0)
+        mesh.texspace_size = (h, h, 1)
+
+    mesh.update()
+    return mesh
+
+
+def render_settings(scene) -> list:
+    """Returns the data structs that hold the render settings of a scene: output, film and performance settings, image
+    format, EEVEE and Cycles settings and color management."""
+    structs = [scene.render, scene.render.image_settings, scene.eevee, scene.view_settings, scene.display_settings]
+    if hasattr(scene, "cycles"):  # Only while the Cycles addon is enabled
+        structs += [scene.cycles, scene.view_layers[0].cycles]
+    return structs
+
+
+def get_render_settings(scene) -> list:
+    """Returns the values of all render settings of a scene (see render_settings), one dictionary per struct."""
+    settings = []
+    for struct in render_settings(scene):
+        values = {}
+        for prop in struct.bl_rna.properties:
+            if prop.identifier == "rna_type" or prop.is_readonly or prop.type in ("POINTER", "COLLECTION"):
+                continue
+            value = getattr(struct, prop.identifier)
+            values[prop.identifier] = tuple(value) if getattr(prop, "array_length", 0) > 0 else value
+        settings.append(values)
+
+    return settings
+
+
+def set_render_settings(scene, settings: list):
+    """Sets the render settings of a scene to values returned by get_render_settings."""
+    for struct, values in zip(render_settings(scene), settings):
+        for identifier, value in values.items():
+            try:
+                setattr(struct, identifier, value)
+            except (AttributeError, TypeError, ValueError):
+                pass  # Not settable in the current state (e.g. options of another engine or device)
+
+
+def copy_render_settings(source_scene, scene):
+    """Gives scene the render settings of the source scene, so that the standard scene renders (and writes files) like the
+    scene the user set up, and settings changed by earlier jobs (like render profiles) are reset."""
+    set_render_settings(scene, get_render_settings(source_scene))
+
+
+def find_template_plane(scene):
+    """Returns the plane of a standard scene, or None if scene is not a complete standard scene (e.g. if it was edited)."""
+    meshes = [o for o in scene.collection.all_objects if o.type == "MESH"]
+    if len(meshes) != 1 or scene.camera is None or scene.world is None or not scene.world.use_nodes:
+        return None
+
+    return meshes[0]
+
+
+def get_standard_scene(source_scene, material):
+    """Returns the standard render scene for material. The scene is built once and then kept in the blend data as a template:
+    later jobs only swap the material of the plane, instead of rebuilding the scene, world and HDRI.
+
+    The render settings of the source scene are copied every time, and the compositor that capturing sets up (see
+    bnr.src.misc.capture) is switched off again, so nothing that an earlier job changed carries over.
+
+    Arguments:
+        source_scene -- The scene to copy the render settings from
+        material -- The material to render
+
+    Returns:
+        The standard scene
+    """
+    scene = bpy.data.scenes.get(SCENE_NAME)
+    plane = find_template_plane(scene) if scene else None
+    if plane is None:
+        return create_standard_scene(source_scene, material)
+
+    if len(plane.data.materials) == 0:
+        plane.data.materials.append(material)
+    elif plane.data.materials[0] != material:
+        plane.data.materials[0] = material
+    copy_render_settings(source_scene, scene)
+    scene.use_nodes = False  # The standard scene has no compositor of its own
+
+    return scene
+
+
+def create_standard_scene(source_scene, material):
+    """Creates a standard render scene: the material is applied to a plane that is lit by an HDRI and viewed from above by a camera.
+    Only the data API is used, so this works without any window or operator context (e.g. when running Blender in background mode).
+    Any old standard scene is deleted first, use get_standard_scene to reuse it instead. The scene gets the render settings
+    of the source scene (see copy_render_settings), but not its objects, world or compositor.
+
+    Arguments:
+        source_scene -- The scene to copy the render settings from
+        material -- The material to render
+
+    Returns:
+        The new scene
+    """
+    old_scene = bpy.data.scenes.get(SCENE_NAME)
+    if old_scene:
+        delete_scene(old_scene)
+
+    scene = bpy.data.scenes.new(SCENE_NAME)
+
+    copy_render_settings(source_scene, scene)
+
+    # Add plane and apply material
+    plane = bpy.data.objects.new(PLANE_NAME, create_plane_mesh(PLANE_NAME))
+    plane.data.materials.append(material)
+    scene.collection.objects.link(plane)
+
+    # Setup HDRI
+    scene.world = bpy.data.worlds.new(SCENE_NAME)
+    setup_HDRI_for_world(scene.world)
+
+    # Setup camera placement
+    camera = bpy.data.objects.new(CAMERA_NAME, bpy.data.cameras.new(CAMERA_NAME))
+    camera.location = (0, 0, 2)
+    camera.rotation_euler = (0, 0, 0)
+    scene.collection.objects.link(camera)
+    scene.camera = camera
+
+    return scene
@@ -0,0 +1,156 @@
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+
+import bpy
+
+import bnr
+from bnr.src.misc.job import RenderJob, SHARD_DIR
+from bnr.src.misc.jsonl import sorted_records
+from bnr.src.misc.param_store import write_param_schema, PARAM_SCHEMA_FILE
+from bnr.src.misc.param_writer import (write_param_data_json, FORMAT_JSON, FORMAT_MATRIX, LABELS_FILE, PARAM_DATA_FILE,
+                                       PARAM_DATA_JSONL_FILE)
+from bnr.src.misc.memmap_store import OUTPUT_MEMMAP
+from bnr.src.misc.pipeline import (prepare_scene, write_param_min_max, load_or_create_design, bind_material,
+                                   open_memmap_dataset, open_manifest, check_atlas_setup)
+from bnr.src.misc.strategies import STRATEGY_ADAPTIVE
+from bnr.src.misc.tar_store import SHARD_INDEX_FILE
+
+JOB_BLEND_FILE = "job.blend"
+JOB_SPEC_FILE = "job.json"
+WORKER_LOG_FILE = "log.txt"
+CLI_EXPR = "import bnr.cli; bnr.cli.main()"
+
+
+def shard_ranges(start, end, workers):
+    """Splits the index range [start, end) into (at most) workers disjoint, consecutive ranges of nearly equal size."""
+    n = end - start
+    workers = max(1, min(workers, n))
+    size, excess = divmod(n, workers)
+    ranges = []
+
+    for k in range(workers):
+        stop = start + size + (1 if k < excess else 0)
+        ranges.append((start, stop))
+        start = stop
+
+    return ranges
+
+
+def worker_command(blend_path, spec_path, threads):
+    return [bpy.app.binary_path, "-b", blend_path, "-t", str(threads), "--python-expr", CLI_EXPR, "--", spec_path]
+
+
+def worker_env():
+    """Makes sure that the workers can import bnr, even if the addon is not installed in their user scripts."""
+    env = dict(os.environ)
+    addon_parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(bnr.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (addon_parent_dir, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def run_sharded_job(job: RenderJob, source_scene, material):
+    """Renders a job with job.workers background Blender processes, each rendering a disjoint range of sample indices.
+
+    The scene is prepared (and parameters are eliminated) once in this process, and the result is saved to a copy of the
+    .blend file that all workers open, so that every worker renders the exact same setup. The design matrix is also created
+    here, every worker renders its own row range of it. Once all workers are done, their
+    parameter data and labels are merged into the output directory.
+
+    Raises:
+        ValueError if the job uses the adaptive strategy, whose rounds depend on each other's renders, or if it renders an
+        atlas without the standard setup
+    """
+    if job.strategy == STRATEGY_ADAPTIVE:
+        raise ValueError("Jobs with the adaptive strategy can not be sharded, render them with a single worker")
+    check_atlas_setup(job)
+
+    scene = prepare_scene(job, source_scene, material)
+    plan = bind_material(material.node_tree.nodes)
+    design = load_or_create_design(job, plan)  # Also sets the number of samples of the job
+    if job.param_format == FORMAT_MATRIX:
+        write_param_schema(job.output_dir, plan, levels=design.levels)
+    open_manifest(job).flush()  # Filled by the workers
+    if job.output_format == OUTPUT_MEMMAP and job.write_images:
+        open_memmap_dataset(job, scene.render.image_settings.color_mode, len(design.table)).flush()  # Filled by the workers
+
+    blend_path = job.output_dir + JOB_BLEND_FILE
+    bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True)
+
+    ranges = shard_ranges(job.start_index, job.end_index, job.workers)
+    threads = max(1, multiprocessing.cpu_count() // len(ranges))
+    processes = []
+
+    for worker_id, (start, end) in enumerate(ranges):
+        worker_job = RenderJob.from_dict(job.to_dict())
+        worker_job.parameter_setup = ""  # The parameter setup is already stored in the .blend copy
+        worker_job.eliminate_parameters = False
+        worker_job.workers = 1
+        worker_job.start_index = start
+        worker_job.end_index = end
+        worker_job.worker_id = worker_id
+
+        shard_dir = worker_job.metadata_dir
+        os.makedirs(shard_dir, exist_ok=True)
+        spec_path = shard_dir + JOB_SPEC_FILE
+        with open(spec_path, "w") as f:
+            json.dump(worker_job.to_dict(), f)
+
+        log = open(shard_dir + WORKER_LOG_FILE, "w")
+        processes.append((worker_id, subprocess.Popen(
+            worker_command(blend_path, spec_path, threads), stdout=log, stderr=subprocess.STDOUT, env=worker_env()), log))
+
+    sys.stdout.write("===== STARTED {} RENDER WORKERS ({}) =====\n".format(len(processes), len(job.indices)))
+    sys.stdout.flush()
+
+    failed = []
+    for worker_id, process, log in processes:
+        if process.wait() != 0:
+            failed.append(worker_id)
+        log.close()
+
+    if failed:
+        raise RuntimeError("Render workers {} failed, see their logs in {}".format(failed, job.output_dir + SHARD_DIR.format("*")))
+
+    merge_shards(job.output_dir, ranges, param_format=job.param_format)
+    write_param_min_max(job.output_dir, material.node_tree.nodes)
+
+
+def merge_shards(output_dir, ranges, param_format=FORMAT_JSON):
+    """Merges the parameter data and labels written by the workers of a sharded job into the output directory.
+    Sample ids are already global (every worker renders a different index range), so the shards are simply concatenated in
+    order. Records are streamed one at a time, so memory use does not grow with the size of the job.
+    """
+    shards = [(os.path.join(output_dir, SHARD_DIR.format(k), ""), range(start, end)) for k, (start, end) in enumerate(ranges)]
+
+    def param_records():
+        for shard_dir, indices in shards:
+            yield from sorted_records(shard_dir + PARAM_DATA_JSONL_FILE, indices)
+
+    if param_format == FORMAT_MATRIX:
+        sys.stdout.write("Wrote parameter data to: {}\n".format(output_dir + PARAM_SCHEMA_FILE))  # Written up front
+    else:
+        with open(output_dir + PARAM_DATA_JSONL_FILE, "w") as f:
+            for record in param_records():
+                f.write(json.dumps(record) + "\n")
+
+        if param_format == FORMAT_JSON:
+            write_param_data_json(output_dir + PARAM_DATA_FILE, param_records())
+            sys.stdout.write("Wrote parameter data to: {}\n".format(output_dir + PARAM_DATA_FILE))
+        else:
+            sys.stdout.write("Wrote parameter data to: {}\n".format(output_dir + PARAM_DATA_JSONL_FILE))
+
+    with open(output_dir + LABELS_FILE, "w", newline="") as f:
+        for shard_dir, _ in shards:
+            with open(shard_dir + LABELS_FILE, "r", newline="") as shard_f:
+                shutil.copyfileobj(shard_f, f)
+        sys.stdout.write("Wrote labels to: {}\n".format(output_dir + LABELS_FILE))
+
+    if any(os.path.exists(shard_dir + SHARD_INDEX_FILE) for shard_dir, _ in shards):
+        with open(output_dir + SHARD_INDEX_FILE, "w") as f:
+            for shard_dir, indices in shards:
+                for record in sorted_records(shard_dir + SHARD_INDEX_FILE, indices):
+                    f.write(json.dumps(record) + "\n")
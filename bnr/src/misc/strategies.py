@@ -0,0 +1,187 @@
+"""Permutation strategies decide which parameter values every sample of a job gets. A strategy produces the rows of the design
+matrix lazily: any range of sample indices can be computed on its own, and the number of samples is known up front, so that
+the job can be sharded and its remaining time estimated before anything is rendered.
+
+Strategies are selected by name (see STRATEGIES), new ones only have to implement count and rows.
+"""
+import sys
+
+import numpy as np
+
+from bnr.src.misc.color import wrap_hue
+from bnr.src.misc.design import uniform_to_values
+from bnr.src.misc.parameters import linspace_range
+from bnr.src.misc.samplers import SAMPLER_RANDOM, make_sampler
+
+STRATEGY_SIMULTANEOUS = "SIMULTANEOUS"
+STRATEGY_CONSECUTIVE = "CONSECUTIVE"
+STRATEGY_GRID = "GRID"
+STRATEGY_ADAPTIVE = "ADAPTIVE"
+
+STRATEGY_ITEMS = [
+    (STRATEGY_SIMULTANEOUS, "Input Simultaneously", "All inputs are changed for every sample, with values from the selected sampler"),
+    (STRATEGY_CONSECUTIVE, "Input Consecutive", "Inputs are swept one after the other. For any sample, only one input differs from its default value"),
+    (STRATEGY_GRID, "Grid", "Every combination of Grid Levels values per input, from minimum to maximum (the amount is ignored)"),
+    (STRATEGY_ADAPTIVE, "Adaptive", "Renders in rounds, later rounds concentrate on regions where the renders change the most (captures renders, no sharding)"),
+]
+
+
+class Strategy:
+    """Base class of all strategies.
+
+    Arguments:
+        table -- The ParameterTable of the enabled parameters (see bnr.src.misc.design)
+        defaults -- The current value of every column of the table (see BindingPlan.defaults)
+        render_amount -- The number of samples the user asked for
+        seed -- Seed of all random numbers
+        sampler -- Name of the sampler for strategies that draw random values (see bnr.src.misc.samplers)
+        grid_levels -- Number of values per parameter of grid strategies
+    """
+
+    name = None
+
+    def __init__(self, table, defaults: np.ndarray, render_amount, seed, sampler=SAMPLER_RANDOM, grid_levels=3):
+        self.table = table
+        self.defaults = np.asarray(defaults, dtype=np.float64)
+        self.render_amount = render_amount
+        self.seed = seed
+        self.sampler = sampler
+        self.grid_levels = grid_levels
+
+    def count(self) -> int:
+        """The total number of samples."""
+        return self.render_amount
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        """Returns the parameter values of the samples with the given (consecutive) indices, one row per sample."""
+        raise NotImplementedError
+
+
+class SimultaneousStrategy(Strategy):
+    """Every sample gets new values for all parameters, drawn with the sampler (random or quasi-random)."""
+
+    name = STRATEGY_SIMULTANEOUS
+    _uniform = None
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        if self._uniform is None:
+            self._uniform = make_sampler(self.sampler, self.seed, self.count(), len(self.table))
+        return uniform_to_values(self.table, self._uniform.sample(indices))
+
+
+class ConsecutiveStrategy(Strategy):
+    """The parameters are swept one after the other while all others keep their default value, so consecutive samples only
+    differ in one parameter. The samples are split evenly between the parameters (the first ones get one more if it does not
+    add up), and every parameter is swept in even steps from its minimum to its maximum, like in parameter elimination (see
+    linspace_range: hues are swept over the range that holds 95% of their distribution, integers are rounded). A parameter
+    with a single sample gets the middle of its range, parameters without a sample keep their default value."""
+
+    name = STRATEGY_CONSECUTIVE
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        P = len(self.table)
+        spp, excess = divmod(self.render_amount, max(P, 1))
+        self.sizes = np.array([spp + (1 if p < excess else 0) for p in range(P)], dtype=np.int64)
+        self.ends = np.cumsum(self.sizes)
+        self.hues = np.array([self.table.is_hue(p) for p in range(P)], dtype=bool)
+        self.ints = np.array([t == "INT" for t in self.table.types], dtype=bool)
+        if self.render_amount < P:
+            sys.stdout.write("Warning! Only {} samples for {} parameters, the last {} parameters are not swept!\n".format(
+                self.render_amount, P, P - self.render_amount))
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        indices = np.asarray(indices, dtype=np.int64)
+        values = np.tile(self.defaults, (len(indices), 1))
+        if len(self.table) == 0:
+            return values
+
+        params = np.searchsorted(self.ends, indices, side="right")
+        sizes = self.sizes[params]
+        steps = indices - (self.ends[params] - sizes)
+        t = np.where(sizes > 1, steps / np.maximum(sizes - 1, 1), 0.5)  # Position in the sweep, from 0 to 1
+
+        umin, umax = self.table.mins[params], self.table.maxs[params]
+        swept = umin + t * (umax - umin)
+        hues = self.hues[params]  # The minimum is the mean and the maximum the standard deviation, see linspace_range
+        swept[hues] = wrap_hue(umin[hues] + (4 * t[hues] - 2) * umax[hues])
+        ints = self.ints[params]
+        swept[ints] = np.round(swept[ints])
+
+        values[np.arange(len(indices)), params] = swept
+        return values
+
+
+def grid_levels(table, p, n) -> np.ndarray:
+    """Returns the distinct values of parameter p of a grid with n levels per parameter, spaced like in parameter
+    elimination (see linspace). Integer parameters have at most one level per integer, and parameters whose minimum equals
+    their maximum only have one."""
+    values = linspace_range(table.mins[p], table.maxs[p], n, is_hue=table.is_hue(p))
+    if table.types[p] == "INT":
+        values = np.round(values)
+    return np.array(list(dict.fromkeys(float(v) for v in values)))  # Remove duplicates, keep the order
+
+
+class GridStrategy(Strategy):
+    """Full factorial grid over the levels of every parameter (see grid_levels). The grid is never materialized: sample i is
+    decoded into one level index per parameter by mixed-radix arithmetic (the last parameter changes fastest), so any single
+    sample or shard of the grid is computed directly."""
+
+    name = STRATEGY_GRID
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.levels = [grid_levels(self.table, p, self.grid_levels) for p in range(len(self.table))]
+        radices = [len(l) for l in self.levels]
+
+        # Weight of every digit, the product of the radices of all following parameters (Python ints, which can not overflow)
+        total = 1
+        weights = []
+        for radix in reversed(radices):
+            weights.append(total)
+            total *= radix
+        if total > np.iinfo(np.int64).max:
+            raise ValueError("A grid of {} samples is too large, use fewer levels or parameters".format(total))
+
+        self.radices = np.array(radices, dtype=np.int64)
+        self.weights = np.array(weights[::-1], dtype=np.int64)
+        self._count = total
+
+    def count(self) -> int:
+        return self._count
+
+    def decode(self, indices: np.ndarray) -> np.ndarray:
+        """Returns the level index of every parameter for the given sample indices, one row per sample."""
+        indices = np.asarray(indices, dtype=np.int64)
+        return (indices[:, None] // self.weights[None, :]) % self.radices[None, :]
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        digits = self.decode(indices)
+        values = np.empty(digits.shape)
+        for p, levels in enumerate(self.levels):
+            values[:, p] = levels[digits[:, p]]
+        return values
+
+
+class AdaptiveStrategy(SimultaneousStrategy):
+    """Rows start out like the simultaneous strategy, but only the first round of samples is rendered with them: the rows of
+    every later round are replaced based on the renders of the previous ones while the job runs (see bnr.src.misc.adaptive)."""
+
+    name = STRATEGY_ADAPTIVE
+
+
+STRATEGIES = {
+    STRATEGY_SIMULTANEOUS: SimultaneousStrategy,
+    STRATEGY_CONSECUTIVE: ConsecutiveStrategy,
+    STRATEGY_GRID: GridStrategy,
+    STRATEGY_ADAPTIVE: AdaptiveStrategy,
+}
+
+
+def make_strategy(name, table, defaults, render_amount, seed, sampler=SAMPLER_RANDOM, grid_levels=3) -> Strategy:
+    """Creates a strategy by name.
+
+    Raises:
+        KeyError if there is no strategy with that name
+    """
+    return STRATEGIES[name](table, defaults, render_amount, seed, sampler=sampler, grid_levels=grid_levels)
@@ -0,0 +1,150 @@
+"""Writes a dataset into rolling tar shards (in the layout of WebDataset) instead of one file per image. Every sample is stored
+as consecutive members that share its key: the image (e.g. 000000042.png), its normalized labels (000000042.labels.json)
+and its parameters (000000042.params.json). Shards are written strictly sequentially, which is far cheaper for the file
+system than millions of small files, and they can be streamed sequentially at training time.
+
+Images inside a shard are addressed as <shard>.tar/<member> (see split_member), and every image is listed in a shard index
+with its offset in the shard, so that single samples can still be read without scanning the shard.
+"""
+import hashlib
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+
+from bnr.src.misc.jsonl import JsonlAppender, KEY_INDEX
+
+OUTPUT_FILES = "FILES"
+OUTPUT_TAR = "TAR"
+
+TAR_EXTENSION = ".tar"
+SHARD_NAME = "shard-{:06d}" + TAR_EXTENSION
+WORKER_SHARD_NAME = "shard-{:03d}-{:06d}" + TAR_EXTENSION  # Shards of the workers of a sharded job
+SHARD_INDEX_FILE = "shard_index.jsonl"
+KEY_LENGTH = 9  # Sample keys are zero padded, so that shards list in sample order
+
+KEY_SHARD = "shard"
+KEY_MEMBER = "member"
+KEY_OFFSET = "offset"
+KEY_SIZE = "size"
+
+
+def sample_key(index) -> str:
+    return str(index).zfill(KEY_LENGTH)
+
+
+def shard_filename(shard, worker_id=None) -> str:
+    """Returns the file name of shard number shard (of a worker of a sharded job, if worker_id is set)."""
+    return SHARD_NAME.format(shard) if worker_id is None else WORKER_SHARD_NAME.format(worker_id, shard)
+
+
+def split_member(path):
+    """Splits the path of an image inside a shard into the path of the shard and the member name. Returns (path, None) for
+    the path of a regular file."""
+    parent, name = os.path.split(path)
+    if parent.endswith(TAR_EXTENSION):
+        return parent, name
+
+    return path, None
+
+
+class TarShardStore:
+    """An image store (see bnr.src.misc.encoder) that appends every sample to the current tar shard, and starts a new shard
+    after shard_size samples. Images may be put from several encoder threads, they are written one at a time.
+
+    Arguments:
+        output_dir -- The directory the shards are written to
+        extension -- The file extension of the images
+        metadata_dir -- The directory of the shard index
+        shard_size -- Number of samples per shard
+        worker_id -- Set for the workers of a sharded job, whose shards are named by worker
+        resume -- If set, the shard index is appended to and new shards are numbered after the existing ones (shards of an
+                  interrupted run are never appended to, as their end may be broken)
+        manifest -- If set, the shard and offset of every image are also recorded in this Manifest (see bnr.src.misc.manifest)
+    """
+
+    def __init__(self, output_dir, extension, metadata_dir, shard_size=1000, worker_id=None, resume=False, manifest=None):
+        self.output_dir = output_dir
+        self.manifest = manifest
+        self.extension = extension
+        self.shard_size = shard_size
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._tar = None
+        self._shard_path = None
+        self._count = 0
+        self._shard = 0
+        while resume and os.path.exists(self._path(self._shard)):
+            self._shard += 1
+
+        self._index = JsonlAppender(metadata_dir + SHARD_INDEX_FILE)
+        self._index.open(resume=resume)
+
+    def _path(self, shard):
+        return self.output_dir + shard_filename(shard, self.worker_id)
+
+    def _add(self, name, data: bytes, mtime):
+        """Appends a member to the current shard and returns the offset of its data."""
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = mtime
+        self._tar.addfile(info, io.BytesIO(data))
+        padded = (len(data) + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE  # Data is padded to full blocks
+        return self._tar.offset - padded
+
+    def put(self, index, data: bytes, records=None):
+        """Writes the image of a sample to the current shard, followed by its records (a dictionary of name -> JSON
+        compatible value, e.g. {"labels": [...]}), and returns its location.
+        """
+        key = sample_key(index)
+        with self._lock:
+            if self._tar is None or self._count >= self.shard_size:
+                self._roll()
+
+            mtime = int(time.time())  # Whole seconds, fractions would need an extra PAX header per member
+            member = key + self.extension
+            offset = self._add(member, data, mtime)
+            for name, value in (records or {}).items():
+                self._add("{}.{}.json".format(key, name), json.dumps(value).encode("utf-8"), mtime)
+            self._count += 1
+            self._tar.fileobj.flush()
+
+            self._index.append({KEY_INDEX: index, KEY_SHARD: os.path.basename(self._shard_path), KEY_MEMBER: member,
+                                KEY_OFFSET: offset, KEY_SIZE: len(data)})
+            if self.manifest is not None:
+                self.manifest.locate(index, self._shard, offset, len(data))
+            return os.path.join(self._shard_path, member)
+
+    def _roll(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._shard += 1
+
+        self._shard_path = self._path(self._shard)
+        self._tar = tarfile.open(self._shard_path, "w", format=tarfile.PAX_FORMAT)
+        self._count = 0
+
+    def close(self):
+        """Finishes the current shard."""
+        with self._lock:
+            if self._tar is not None:
+                self._tar.close()
+                self._tar = None
+            self._index.close()
+
+
+def member_checksums(tar_path, members: set) -> dict:
+    """Returns the SHA-1 hex digests of the given members of a shard, for the members that could be read. A shard whose end
+    is broken (because its job was interrupted) is read up to there."""
+    checksums = {}
+    try:
+        with tarfile.open(tar_path, "r") as tar:
+            for info in tar:
+                if info.name in members:
+                    checksums[info.name] = hashlib.sha1(tar.extractfile(info).read()).hexdigest()
+    except (tarfile.TarError, EOFError, OSError):
+        pass
+
+    return checksums
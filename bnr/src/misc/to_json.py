@@ -27,6 +27,22 @@ def input_value_to_json(inp):
         return inp.default_value
 
 
+def node_values_to_json(nodes) -> dict:
+    """Returns the current values of all unlinked inputs of all nodes, as a dictionary of node name -> input identifier -> value."""
+    params = {}
+    for n in nodes:
+        params[n.name] = {}
+        for i in n.inputs:
+            try:
+                if (not i.is_linked):  # Save parameter unless it is linked
+                    params[n.name][i.identifier] = input_value_to_json(i)
+            except (AttributeError, KeyError):
+                # Some special node sockets do not have a value, skip them
+                pass
+
+    return params
+
+
 def node_params_to_json(nodes) -> dict:
     """Extract user set min and max value of node parameters (inputs) and returns them in a dictionary.
 
@@ -98,6 +114,9 @@ def node_params_min_max_to_json(nodes) -> dict:
     for n in nodes:
         if n.node_enabled:
             for i in n.inputs:
+                if not get_input_enabled(i):
+                    continue  # Inputs that can't be enabled (like shader sockets) have no user_props
+
                 umin = i.user_props.user_min
                 umax = i.user_props.user_max
                 i_data = {
@@ -1,12 +1,12 @@
 from bpy.props import StringProperty, IntProperty, FloatProperty
 from bpy.types import Operator,NodeSocket
-from bpy import ops
-from bnr.src.misc.to_json import node_params_to_json
 from bnr.src.misc.parameters import get_input_enabled, set_input_enabled, is_vector_type, linspace
 from bnr.src.misc.parameter_transmutator import transmute_params_random
+from bnr.src.misc.capture import setup_capture, remove_capture, render_to_array, to_display, write_image, check_display_settings
+from bnr.src.misc.render_cache import RenderCache, RenderKeys
 
+import random
 import numpy as np
-from PIL import Image
 from pathlib import Path
 from sklearn.decomposition import PCA
 
@@ -17,40 +17,43 @@ def flatten_image(img_array: np.ndarray):
 def norm(pc1, pc2, exp_var_rat):
     return sum(abs(pc1-pc2) * exp_var_rat)
 
-def open_image(image_path: str):
-    img = np.array(Image.open(image_path)).astype(np.float32) / 255
-    if img.shape[2] == 4:
-        img = img[:,:,:3]
-
-    return img
-
-class NODE_OP_EliminateParameters(Operator):
-    bl_idname = "node.eliminate_parameters"
-    bl_label = "Eliminate Parameters"
-    bl_options = {"REGISTER"}
-
-    def execute(self, context):
-        """Attempts to find parameters that have less than threshold impact on the final renders, and disables them.
-        """
-        nodes = context.material.node_tree.nodes
-        render = context.scene.render
-        props = context.scene.pe_props
-        parameter_save = node_params_to_json(nodes)
-        eliminated = []
-
+def eliminate_parameters(nodes, scene, props, save_renders=False, seed=None, cache=None):
+    """Attempts to find parameters that have less than threshold impact on the final renders, and disables them.
+
+    Arguments:
+        nodes -- The nodes of the material to eliminate parameters of
+        scene -- The scene that is rendered
+        props -- The parameter elimination properties (PG_ParameterEliminationProperties)
+        save_renders -- If true, the renders are also saved to props.render_tmp_output (they are compared in memory)
+        seed -- Seed for the random parameter values that every input is tested against (random if None)
+        cache -- If set, renders are looked up in and added to this RenderCache (see bnr.src.misc.render_cache)
+
+    Returns:
+        A list of messages describing the eliminated parameters
+
+    Raises:
+        ValueError if the renders of the scene can not be compared as displayed (see bnr.src.misc.capture.check_display_settings)
+    """
+    check_display_settings(scene)  # The renders are compared as display values, like the images Blender writes
+    eliminated = []
+    rng = random.Random(seed)
+    capture_state = setup_capture(scene)
+    keys = RenderKeys(nodes.id_data, scene) if cache else None
+
+    try:
         for n in nodes:
             if not n.node_enabled:
                 continue
 
             for i in n.inputs:
-                
+            
                 if is_vector_type(i):  # We treat elements of vectory types as separate parameters
                     for i_sub, en in enumerate(i.subinput_enabled):
                         if not en:
                             continue
 
                         props.i_sub = i_sub
-                        decision, max_norm = self._get_decision_for_input(i, nodes, props, render, i_sub=i_sub)
+                        decision, max_norm = _get_decision_for_input(i, nodes, props, scene, save_renders, rng, cache, keys, i_sub=i_sub)
                         if not decision:
                             set_input_enabled(i, False, ind=i_sub)
                             msg = "DISABLED input {} index {} of node {} (Max Norm: {:.3f}).".format(i.name, i_sub, n.name, max_norm)
@@ -64,7 +67,7 @@ class NODE_OP_EliminateParameters(Operator):
                         continue
 
                     props.i_sub = -1
-                    decision, max_norm = self._get_decision_for_input(i, nodes, props, render)
+                    decision, max_norm = _get_decision_for_input(i, nodes, props, scene, save_renders, rng, cache, keys)
                     if not decision:
                         set_input_enabled(i, False)
                         msg = "DISABLED input {} of node {} (Max Norm: {:.3f}).".format(i.name, n.name, max_norm)
@@ -72,76 +75,96 @@ class NODE_OP_EliminateParameters(Operator):
                         eliminated.append(msg)
                     else:
                         print("Keeping input {} of node {} (Max Norm: {:.3f}).".format(i.name, n.name, max_norm))
+    finally:
+        remove_capture(scene, capture_state)  # Leave the compositor of the scene as it was
+
+    print("==== Parameter elimination summary ====")
+    print("Total parameters eliminated: {}".format(len(eliminated)))
+    for e in eliminated:
+        print(e)
+
+    # TODO load back the default values...
+
+    return eliminated
+
+
+def _get_decision_for_input(input, nodes, props, scene, save_renders, rng, cache, keys, i_sub=-1):
+    possible_values = linspace(input, n=props.N_renders, i_sub=i_sub)
+    total_max_norm = 0
+    
+    # Loop L times (as it might have more impact for some parameter randomizations than others)
+    for l in range(props.L_loops):
+        #image_paths = ops.node.render_over_values(input, possible_values, i_sub=i_sub)
+        transmute_params_random(nodes, rng=rng)
+        images = render_over_values(input, possible_values, props, scene, save_renders=save_renders, i_sub=i_sub,
+                                    cache=cache, keys=keys)
+
+        # Create image matrix for PCA
+        image_matrix = np.concatenate([flatten_image(img) for img in images], axis=0)
+
+        pca = PCA(n_components=props.C_components)
+        principal_comps = pca.fit_transform(image_matrix)
+        exp_var_rat = pca.explained_variance_ratio_
+        if sum(exp_var_rat) < props.total_explained_var_thresh:
+            print("Warning! The total explained variance ratio is below {} ({})!".format(props.total_explained_var_thresh, sum(exp_var_rat)))
+
+        base_pcs = principal_comps[0,:]
+        max_norm = 0
+        for ind, pcs in enumerate(principal_comps[1:]):
+            norm_ = norm(base_pcs, pcs, exp_var_rat)
+            max_norm = max(max_norm, norm_)
+            total_max_norm = max(total_max_norm, max_norm)
+            if norm_ >= props.norm_thresh:
+                print("(loop {}) max norm of {:.3f} did reach threshold of {} in image {}".format(l, max_norm, props.norm_thresh, ind+1))
+                return True, total_max_norm
+        
+        print("(loop {}) max norm of {:.3f} did not reach threshold of {}".format(l, max_norm, props.norm_thresh))
 
-        print("==== Parameter elimination summary ====")
-        print("Total parameters eliminated: {}".format(len(eliminated)))
-        for e in eliminated:
-            print(e)
+    return False, total_max_norm  # If not enough entropy was reached in any loop, this input can be disabled
 
-        # TODO load back the default values...
 
-        return {"FINISHED"}
+def render_over_values(input: NodeSocket, possible_values: list, props, scene, save_renders=False, i_sub=-1, cache=None, keys=None):
+    """
+    Renders an image for each value in 'possible_values' for input 'input'. The renders are captured in memory
+    (see bnr.src.misc.capture), and only written to props.render_tmp_output if save_renders is set.
+    If cache is set, renders of identical socket values are taken from it (keys are the RenderKeys of the material and scene).
 
-    def _get_decision_for_input(self, input, nodes, props, render, i_sub=-1):
-        possible_values = linspace(input, n=props.N_renders, i_sub=i_sub)
-        total_max_norm = 0
-        
-        # Loop L times (as it might have more impact for some parameter randomizations than others)
-        for l in range(props.L_loops):
-            #image_paths = ops.node.render_over_values(input, possible_values, i_sub=i_sub)
-            transmute_params_random(nodes)
-            image_paths = self.render_over_values(input, possible_values, props, render, i_sub=i_sub)
-            
-            base_img = open_image(image_paths[0])
-            base_img = flatten_image(base_img)
-            image_matrix = base_img
-
-            for p in image_paths[1:]:  # Create image matrix for PCA 
-                img = open_image(p)
-                img = flatten_image(img)
-                image_matrix = np.concatenate((image_matrix, img), axis=0)
-
-            pca = PCA(n_components=props.C_components)
-            principal_comps = pca.fit_transform(image_matrix)
-            exp_var_rat = pca.explained_variance_ratio_
-            if sum(exp_var_rat) < props.total_explained_var_thresh:
-                print("Warning! The total explained variance ratio is below {} ({})!".format(props.total_explained_var_thresh, sum(exp_var_rat)))
-
-            base_pcs = principal_comps[0,:]
-            max_norm = 0
-            for ind, pcs in enumerate(principal_comps[1:]):
-                norm_ = norm(base_pcs, pcs, exp_var_rat)
-                max_norm = max(max_norm, norm_)
-                total_max_norm = max(total_max_norm, max_norm)
-                if norm_ >= props.norm_thresh:
-                    print("(loop {}) max norm of {:.3f} did reach threshold of {} in image {}".format(l, max_norm, props.norm_thresh, ind+1))
-                    return True, total_max_norm
-            
-            print("(loop {}) max norm of {:.3f} did not reach threshold of {}".format(l, max_norm, props.norm_thresh))
+    Returns: 
+        A list of float32 RGB display value arrays, one per render
+    """
+    images = []
+    render_tmp_output = Path(props.render_tmp_output)
 
-        return False, total_max_norm  # If not enough entropy was reached in any loop, this input can be disabled
+    # Render N images, iterating through possible parameter values
+    for ren in range(props.N_renders):
+        if i_sub >= 0:
+            input.default_value[i_sub] = float(possible_values[ren])
+        else:
+            input.default_value = possible_values[ren]
 
+        key = keys.for_nodes(input.id_data.nodes) if cache else None
+        pixels = cache.load_pixels(key) if cache else None
+        if pixels is None:
+            pixels = render_to_array(scene)
+            if cache:
+                cache.put_pixels(key, pixels)
 
-    def render_over_values(self, input: NodeSocket, possible_values: list, props, render, i_sub=-1):
-        """
-        Randomizes all parameters, then renders an image for each value in 'possible_values' for input 'input'.
-        
-        Returns: 
-            A list of image paths to renders
+        images.append(to_display(pixels)[:, :, :3])
+        if save_renders:
+            write_image(str(render_tmp_output / "{}.png".format(ren)), pixels)
+
+    return images
+
+
+class NODE_OP_EliminateParameters(Operator):
+    bl_idname = "node.eliminate_parameters"
+    bl_label = "Eliminate Parameters"
+    bl_options = {"REGISTER"}
+
+    def execute(self, context):
+        """Attempts to find parameters that have less than threshold impact on the final renders, and disables them.
         """
-        image_paths = []
-        render_tmp_output = Path(props.render_tmp_output)
-
-        # Render N images, iterating through possible parameter values
-        for ren in range(props.N_renders):
-            if i_sub >= 0:
-                input.default_value[i_sub] = float(possible_values[ren])
-            else:
-                input.default_value = possible_values[ren]
-
-            path = str(render_tmp_output / "{}.png".format(ren))
-            image_paths.append(path)
-            render.filepath = path
-            ops.render.render(write_still=True)
-
-        return image_paths
\ No newline at end of file
+        props = context.scene.props
+        eliminate_parameters(context.material.node_tree.nodes, context.scene, context.scene.pe_props,
+                             save_renders=props.debug_mode, cache=RenderCache() if props.use_cache else None)
+        return {"FINISHED"}
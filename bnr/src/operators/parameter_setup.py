@@ -31,6 +31,43 @@ def load_default_parameters(json_data:dict, nodes):
             set_param_value_from_json(node, input_id, input_data)
 
 
+def load_parameter_setup(json_data: dict, nodes):
+    """Applies a parameter setup (as saved by NODE_EDITOR_OP_SaveParameterSetup) to a material's nodes.
+    Loads which nodes and inputs are enabled, the user set min and max values, and the default parameter values.
+    """
+    for node_name, node_data in json_data.items():
+        try:
+            node = nodes.get(node_name)
+            node.node_enabled = node_data[KEY_ENABLED]
+            node.node_show = get_node_init_status(node)
+
+            for input_id, input_data in node_data[KEY_DEFAULT_PARAMS].items():
+                set_param_value_from_json(node, input_id, input_data)
+
+            for input_id, input_data in node_data[KEY_USER_PARAMS].items():
+                input_data = input_data[KEY_USER_PARAMS]
+                input = find_socket_by_id(node.inputs, input_id)
+
+                set_input_enabled(input, input_data[KEY_ENABLED])
+                input.input_show = get_input_init_status(input)
+
+                i_min = input_data[KEY_MIN]
+                i_max = input_data[KEY_MAX]
+                try:
+                    input.user_props.user_min = i_min
+                    input.user_props.user_max = i_max
+                except (AttributeError, KeyError):
+                    pass
+                except ValueError as e:
+                    print(
+                        "Could not assign min and max value for node {}, input {}. \n Error: {}".format(
+                            node_name, input_id, e
+                        )
+                    )
+        except (AttributeError, KeyError) as e:
+            print(e)  # Catch all errors and try to load as much as possible
+
+
 class NODE_EDITOR_OP_LoadDefaultParameters(bpy.types.Operator):
     bl_idname = "node.load_default_parameters"
     bl_label = "Load Default Parameters"
@@ -82,37 +119,7 @@ class NODE_EDITOR_OP_LoadParameterSetup(bpy.types.Operator, ImportHelper):
             data = json.load(f)
             props.parameter_setup_filepath = self.filepath
 
-            for node_name, node_data in data.items():
-                try:
-                    node = nodes.get(node_name)
-                    node.node_enabled = node_data[KEY_ENABLED]
-                    node.node_show = get_node_init_status(node)
-
-                    for input_id, input_data in node_data[KEY_DEFAULT_PARAMS].items():
-                        set_param_value_from_json(node, input_id, input_data)
-
-                    for input_id, input_data in node_data[KEY_USER_PARAMS].items():
-                        input_data = input_data[KEY_USER_PARAMS]
-                        input = find_socket_by_id(node.inputs, input_id)
-
-                        set_input_enabled(input, input_data[KEY_ENABLED])
-                        input.input_show = get_input_init_status(input)
-
-                        i_min = input_data[KEY_MIN]
-                        i_max = input_data[KEY_MAX]
-                        try:
-                            input.user_props.user_min = i_min
-                            input.user_props.user_max = i_max
-                        except (AttributeError, KeyError):
-                            pass
-                        except ValueError as e:
-                            print(
-                                "Could not assign min and max value for node {}, input {}. \n Error: {}".format(
-                                    node_name, input_id, e
-                                )
-                            )
-                except (AttributeError, KeyError) as e:
-                    print(e)  # Catch all errors and try to load as much as possible
+            load_parameter_setup(data, nodes)
 
         return {"FINISHED"}
 
@@ -1,66 +1,9 @@
-import bpy
-import copy
-import json
-import random
-import sys
-import time
-import csv
-import numpy as np
-
-from PIL import Image
-from bpy import ops
 from bpy.types import Operator
-from mathutils import Color
-from pathlib import Path
-
-import bnr
-from bnr.src.misc.parameters import find_number_of_enabled_sockets
-from bnr.src.misc.to_json import input_value_to_json, node_params_min_max_to_json, node_params_to_json
-from bnr.src.misc.misc import normalize, list_
-from bnr.src.misc.time import seconds_to_complete_time
-from bnr.src.misc.parameter_transmutator import transmute_params_random
-
-
-SCENE_NAME = "RENDER_SCENE_TMP"
-HDRI_FILE = "sunflowers_2k.hdr"
-HDRI_PATH = str(Path(bnr.__file__).parent / "res" / HDRI_FILE)
-
-
-def setup_HDRI_for_world(context):
-    world_node_tree = context.scene.world.node_tree
-    nodes = world_node_tree.nodes
-    links = world_node_tree.links
-    x_start = 0
-    delta_x = -200
-
-    world_node_tree.nodes.clear()
-    context.scene.world.use_nodes = True
-
-    # Create new nodes
-    node_world_output = nodes.new(type="ShaderNodeOutputWorld")
-    node_background = nodes.new(type="ShaderNodeBackground")
-    node_texture_env = nodes.new(type="ShaderNodeTexEnvironment")
-    node_mapping = nodes.new(type="ShaderNodeMapping")
-    node_texture_coord = nodes.new(type="ShaderNodeTexCoord")
 
-    # Move nodes
-    node_world_output.location.x = x_start
-    node_background.location.x = node_world_output.location.x + delta_x
-    node_texture_env.location.x = node_background.location.x + delta_x
-    node_mapping.location.x = node_texture_env.location.x + delta_x
-    node_texture_coord.location.x = node_texture_coord.location.x + delta_x
-
-    # Connect nodes
-    links.new(
-        node_world_output.inputs["Surface"], node_background.outputs["Background"]
-    )
-    links.new(node_background.inputs["Color"], node_texture_env.outputs["Color"])
-    links.new(node_texture_env.inputs["Vector"], node_mapping.outputs["Vector"])
-    links.new(node_mapping.inputs["Vector"], node_texture_coord.outputs["Generated"])
-
-    # Set node values
-    node_background.inputs["Strength"].default_value = 1.0
-    world_node_tree.nodes["Environment Texture"].image = bpy.data.images.load(HDRI_PATH)
+from bnr.src.misc.benchmark import benchmark_profiles, KEY_PROFILE, KEY_SECONDS_PER_IMAGE, KEY_RMSE
+from bnr.src.misc.job import RenderJob
+from bnr.src.misc.pipeline import run_render_job
+from bnr.src.misc.shard import run_sharded_job
 
 
 class NODE_OP_Render(Operator):
@@ -73,123 +16,29 @@ class NODE_OP_Render(Operator):
         return context.material and context.scene.internal_props.nodes_loaded and context.scene.props.render_output_dir != ""
 
     def execute(self, context):
-        all_props = context.scene.props
-
-        # Make a full copy of the current scene and only manipulate that one
-        if all_props.use_standard_setup:
-            try:
-                # Check if an old scene copy exists and delete it
-                context.window.scene = bpy.data.scenes[SCENE_NAME]
-                ops.object.select_all()
-                ops.object.delete()
-                bpy.ops.scene.delete()
-            except KeyError as e:
-                pass
-
-            ops.scene.new(type="FULL_COPY")
-            context.scene.name = SCENE_NAME
-
-        objs = context.scene.objects
-        material = context.material
-        render = context.scene.render
-        nodes = material.node_tree.nodes
-
-        if all_props.use_standard_setup:
-            # Delete unneeded objects
-            obs_to_del = [o for o in objs if o.type in ("MESH", "LIGHT", "CAMERA")]
-            ops.object.delete({"selected_objects": obs_to_del})
-
-            # Add plane and apply material
-            ops.mesh.primitive_plane_add(
-                size=2, enter_editmode=False, location=(0, 0, 0), rotation=(0, 0, 0)
-            )
-            plane = context.selected_objects[0]
-            plane.data.materials.append(material)
+        job = RenderJob.from_props(context.scene.props, context.material)
+        if job.workers > 1:
+            run_sharded_job(job, context.scene, context.material)
+        else:
+            run_render_job(job, context.scene, context.material)
 
-            # Setup HDRI
-            setup_HDRI_for_world(context)
-
-            # Setup camera placement
-            ops.object.camera_add(rotation=(0, 0, 0), location=(0, 0, 2))
-            context.selected_objects[0].name = "Rendering Camera"
-            context.scene.camera = context.object
-
-        # Setup renderer
-        render.resolution_x = all_props.x_res
-        render.resolution_y = all_props.y_res
-        render.resolution_percentage = 100
-        render.engine = "BLENDER_EEVEE"
-        #context.scene.eevee.samples = 200
-        #context.scene.cycles.device = "GPU"
-        #context.scene.cycles.feature_set = "SUPPORTED"
-        #context.scene.cycles.samples = 200
-
-        # Initialize render variables
-        FILEPATH = all_props.render_output_dir
-        FILE_EXTENSION = render.file_extension
-        N = all_props.render_amount
-        param_data = {}
-        data_labels = []
-        r = 0
-
-        # ==== Eliminate parameters automatically ====
-        if all_props.eliminate_parameters:
-            pe_props = context.scene.pe_props
-            pe_props.norm_thresh = 2.0
-            ops.node.eliminate_parameters()
-
-        # Save parameter mins and maxes (so that we can normalize them later)
-        FILENAME = "param_min_max.json"
-        with open(FILEPATH + FILENAME, "w") as f:
-            data = node_params_min_max_to_json(nodes)
-            json.dump(data, f)
-
-        sys.stdout.write("===== STARTING RENDERING JOB ({}) =====\n".format(N))
-
-        start_time = time.time()
-        # renderer = Renderer(nodes, N, NUM_PARAMS)
-
-        while r < N:
-            pd, rl = transmute_params_random(nodes)
-            param_data[r] = pd
-            data_labels.append(rl)
-
-            filename = "{}{}{}".format(FILEPATH, r, FILE_EXTENSION)
-            render.filepath = filename
-            ops.render.render(write_still=True)
-            r += 1
+        return {"FINISHED"}
 
-            # Print progress information
-            passed_time = time.time() - start_time
-            avg_sample_time = "{}h {}m {:.2f}s".format(*seconds_to_complete_time((passed_time / r) * (N - r)))
-            passed_time = "{}h {}m {:.2f}".format(*seconds_to_complete_time(passed_time))
-            msg = "Rendered image {} of {}".format(r, N)
-            sys.stdout.write(
-                "{} [Elapsed: {}][Remaining: {}]\n".format(
-                    msg, passed_time, avg_sample_time
-                )
-            )
-            sys.stdout.flush()
 
-        # Write param data to file
-        FILENAME = "param_data.json"
-        with open(FILEPATH + FILENAME, "w") as f:
-            json.dump(param_data, f)
-            sys.stdout.write(
-                "Wrote parameter data to: {}\n".format(FILEPATH + FILENAME)
-            )
+class NODE_OP_BenchmarkProfiles(Operator):
+    bl_idname = "node.benchmark_profiles"
+    bl_label = "Benchmark Profiles"
+    bl_description = "Render a few samples with every render profile and report the time per image and the error compared to the Final profile"
+    bl_options = {"REGISTER"}
 
-        FILENAME = "normalized_data_labels.csv"
-        with open(FILEPATH + FILENAME, "w", newline="") as f:
-            w = csv.writer(f, delimiter=",")
-            w.writerows(data_labels)
-            sys.stdout.write("Wrote labels to: {}\n".format(FILEPATH + FILENAME))
+    @classmethod
+    def poll(cls, context):
+        return NODE_OP_Render.poll(context)
 
-        total_time = time.time() - start_time
-        sys.stdout.write(
-            "Total Time: {}h {}m {:.2f}s [Avg per render: {:.3f}s]".format(
-                *seconds_to_complete_time(total_time), total_time / (N)
-            )
-        )
+    def execute(self, context):
+        job = RenderJob.from_props(context.scene.props, context.material)
+        results = benchmark_profiles(job, context.scene, context.material)
+        for r in results:
+            self.report({"INFO"}, "{}: {:.3f}s/image, RMSE {:.4f}".format(r[KEY_PROFILE], r[KEY_SECONDS_PER_IMAGE], r[KEY_RMSE]))
 
         return {"FINISHED"}
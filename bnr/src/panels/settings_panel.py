@@ -32,7 +32,7 @@ class NODE_EDITOR_PT_SettingsPanel(NODE_EDITOR_PT_Panel):
         col2.operator("nodes.load_nodes")
 
         # Display all the properties that can be changed by the user to control the rendering
-        props = ["x_res", "y_res", "render_amount", "use_standard_setup", "eliminate_parameters", "render_output_dir",]
+        props = ["x_res", "y_res", "render_amount", "profile", "seed", "permutation_strategy", "sampler", "grid_levels", "workers", "batch_size", "atlas", "reorder", "use_cache", "resume", "use_standard_setup", "eliminate_parameters", "param_format", "capture", "image_format", "output_format", "tar_shard_size", "memmap_dtype", "encoder_threads", "render_output_dir",]
 
         for p in props:
             name = all_props.bl_rna.properties[p].name
@@ -43,3 +43,4 @@ class NODE_EDITOR_PT_SettingsPanel(NODE_EDITOR_PT_Panel):
         col1.operator("node.save_parameter_setup", icon="FILE_TICK")
         col2.operator("node.load_parameter_setup", icon="FILEBROWSER")
         col1.operator("node.load_default_parameters")
+        col2.operator("node.benchmark_profiles")
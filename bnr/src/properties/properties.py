@@ -4,6 +4,10 @@ from pathlib import Path
 from bpy.props import IntProperty, BoolProperty, EnumProperty, CollectionProperty, StringProperty, FloatProperty
 from bpy.types import PropertyGroup
 
+from bnr.src.misc.profiles import PROFILE_DEFAULT, PROFILE_ITEMS
+from bnr.src.misc.samplers import SAMPLER_RANDOM, SAMPLER_ITEMS
+from bnr.src.misc.strategies import STRATEGY_SIMULTANEOUS, STRATEGY_ITEMS
+
 
 def set_abs_path(self, context):
     abs_path = bpy.path.abspath(self.render_output_dir)
@@ -25,6 +29,48 @@ class PG_PublicProps(PropertyGroup):
         name="Amount", description="Total amount of images to render", min=1, default=5
     )
 
+    profile: EnumProperty(
+        name="Render Profile",
+        description="The render quality profile: render engine, samples, denoising, threads, tiles and color management",
+        default=PROFILE_DEFAULT,
+        items=PROFILE_ITEMS
+    )
+
+    seed: IntProperty(
+        name="Seed", description="Seed of the sampled parameter values, the same seed renders the same dataset (0 chooses a random seed for every job)", min=0, default=0
+    )
+
+    sampler: EnumProperty(
+        name="Sampler",
+        description="How the parameter values of the samples are generated",
+        default=SAMPLER_RANDOM,
+        items=SAMPLER_ITEMS
+    )
+
+    workers: IntProperty(
+        name="Workers", description="Number of background Blender processes that the renders are split over", min=1, default=1
+    )
+
+    batch_size: IntProperty(
+        name="Batch Size", description="Number of samples that are keyframed onto consecutive frames and rendered as one animation (1 renders every sample on its own)", min=1, default=1
+    )
+
+    atlas: IntProperty(
+        name="Atlas Size", description="Render Atlas Size x Atlas Size samples at once as the tiles of one larger render (1 renders every sample on its own)", min=1, default=1
+    )
+
+    reorder: BoolProperty(
+        name="Reorder Samples", description="Probe which parameters make EEVEE recompile the shader and render samples in an order in which they change as rarely as possible", default=False
+    )
+
+    use_cache: BoolProperty(
+        name="Use Render Cache", description="Reuse earlier renders of identical parameters, scene and render settings (also for parameter elimination)", default=False
+    )
+
+    resume: BoolProperty(
+        name="Resume", description="Continue an interrupted job in the output directory, skipping images that were already rendered", default=False
+    )
+
     use_standard_setup: BoolProperty(
         name="Use Standard Setup", description="If true, creates a standard light/camera scene setup and renders from a plane.", default=True
     )
@@ -36,14 +82,72 @@ class PG_PublicProps(PropertyGroup):
         update=set_abs_path
     )
 
-    STRATEGIES = [("0", "Input Consecutive", "Inputs will be permuted consecutively. For any sample, only one input will be changed"),
-                  ("1", "Input Simultaneously", "Blö")]
-
     permutation_strategy: EnumProperty(
         name="Permutation Strategy",
         description="The strategy to use when permuting parameters",
-        default="0",
-        items=STRATEGIES
+        default=STRATEGY_SIMULTANEOUS,
+        items=STRATEGY_ITEMS
+    )
+
+    grid_levels: IntProperty(
+        name="Grid Levels", description="Number of values per parameter of the grid strategy", min=2, default=3
+    )
+
+    capture: BoolProperty(
+        name="Capture Pixels",
+        description="Read the pixels of every render directly into memory and encode the images from there, instead of letting Blender write each file",
+        default=False
+    )
+
+    IMAGE_FORMATS = [("PNG", "PNG", "Lossless PNG, 8 bit display values"),
+                     ("WEBP", "WebP (Lossless)", "Lossless WebP, 8 bit display values (smaller than PNG)"),
+                     ("NPY", "NumPy", "Raw float32 scene linear pixels (.npy)")]
+
+    image_format: EnumProperty(
+        name="Image Format",
+        description="The format that captured renders are encoded to",
+        default="PNG",
+        items=IMAGE_FORMATS
+    )
+
+    encoder_threads: IntProperty(
+        name="Encoder Threads", description="Number of background threads that encode and write captured renders", min=1, default=2
+    )
+
+    OUTPUT_FORMATS = [("FILES", "Files", "Write every image to its own file"),
+                      ("TAR", "Tar Shards", "Pack images, labels and parameters into tar shards (captures renders)"),
+                      ("MEMMAP", "NumPy Arrays", "Fill preallocated images.npy and labels.npy arrays (captures renders)")]
+
+    output_format: EnumProperty(
+        name="Output Format",
+        description="How the rendered samples are stored",
+        default="FILES",
+        items=OUTPUT_FORMATS
+    )
+
+    tar_shard_size: IntProperty(
+        name="Samples per Shard", description="Number of samples per tar shard", min=1, default=1000
+    )
+
+    MEMMAP_DTYPES = [("UINT8", "8 Bit", "8 bit display values"),
+                     ("FLOAT16", "Half Float", "16 bit float scene linear values")]
+
+    memmap_dtype: EnumProperty(
+        name="Array Type",
+        description="The data type of the images in images.npy",
+        default="UINT8",
+        items=MEMMAP_DTYPES
+    )
+
+    PARAM_FORMATS = [("JSON", "JSON", "Write param_data.json, a dictionary of sample index to parameters, once all images are rendered"),
+                     ("JSONL", "JSON Lines", "Only keep param_data.jsonl, which is written while rendering with one sample per line"),
+                     ("MATRIX", "Schema + Matrix", "Write the parameter schema once to param_schema.json, the values are the rows of design.npy")]
+
+    param_format: EnumProperty(
+        name="Parameter Format",
+        description="The format of the parameter data file",
+        default="JSON",
+        items=PARAM_FORMATS
     )
 
     eliminate_parameters: BoolProperty(
@@ -0,0 +1,87 @@
+"""Checks that atlas tiles frame the plane exactly like a render of the standard scene. Runs inside Blender:
+
+    blender -b --factory-startup --python tests/test_atlas.py
+"""
+import sys
+import unittest
+from pathlib import Path
+
+try:
+    import bpy
+except ImportError:
+    raise unittest.SkipTest("Needs Blender, run: blender -b --factory-startup --python tests/test_atlas.py")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bpy_extras.object_utils import world_to_camera_view
+from mathutils import Vector
+
+from bnr.src.misc.atlas import Atlas
+from bnr.src.misc.scene_setup import create_standard_scene, delete_scene, find_template_plane
+
+# Points on the plane (in the plane's coordinates), inside the view of the standard camera
+POINTS = [(0, 0, 0), (-0.6, -0.3, 0), (0.5, 0.6, 0), (0.7, -0.7, 0), (-0.2, 0.65, 0)]
+
+
+def pixel_of(scene, obj, point, width, height):
+    """Returns the position of a point of obj in a width x height render of scene, in pixels from the top left."""
+    ndc = world_to_camera_view(scene, scene.camera, obj.matrix_world @ Vector(point))
+    return ndc.x * width, (1 - ndc.y) * height
+
+
+class AtlasFramingTest(unittest.TestCase):
+    def setUp(self):
+        self.material = bpy.data.materials.new("Atlas Test")
+        self.material.use_nodes = True
+        self.scene = create_standard_scene(bpy.context.scene, self.material)
+        self.atlas = None
+
+    def tearDown(self):
+        if self.atlas:
+            self.atlas.remove()
+        delete_scene(self.scene)
+        bpy.data.materials.remove(self.material)
+
+    def assert_same_framing(self, x_res, y_res, pixel_aspect=(1, 1)):
+        render = self.scene.render
+        render.resolution_x, render.resolution_y, render.resolution_percentage = x_res, y_res, 100
+        render.pixel_aspect_x, render.pixel_aspect_y = pixel_aspect
+        self.atlas = Atlas(self.scene, self.material, 1, x_res, y_res)
+        self.scene.view_layers[0].update()
+        self.atlas.scene.view_layers[0].update()
+
+        plane = find_template_plane(self.scene)
+        tile_plane = self.atlas.planes[0]
+        atlas_render = self.atlas.scene.render
+        p = self.atlas.padding
+        for point in POINTS:
+            x, y = pixel_of(self.scene, plane, point, x_res, y_res)
+            tile_x, tile_y = pixel_of(self.atlas.scene, tile_plane, point, atlas_render.resolution_x, atlas_render.resolution_y)
+            self.assertAlmostEqual(x, tile_x - p, places=3, msg="x of {} at {}x{}".format(point, x_res, y_res))
+            self.assertAlmostEqual(y, tile_y - p, places=3, msg="y of {} at {}x{}".format(point, x_res, y_res))
+
+        # The cropped plane has the texture coordinates of the whole plane
+        mesh = tile_plane.data
+        for loop, uv in zip(mesh.loops, mesh.uv_layers[0].data):
+            co = mesh.vertices[loop.vertex_index].co
+            self.assertAlmostEqual(uv.uv.x, (co.x + 1) / 2, places=5)
+            self.assertAlmostEqual(uv.uv.y, (co.y + 1) / 2, places=5)
+        self.assertEqual(tuple(mesh.texspace_size), tuple(plane.data.texspace_size))
+        self.assertEqual(tuple(mesh.texspace_location), tuple(plane.data.texspace_location))
+
+    def test_square(self):
+        self.assert_same_framing(64, 64)
+
+    def test_wide(self):
+        self.assert_same_framing(96, 54)
+
+    def test_tall(self):
+        self.assert_same_framing(40, 72)
+
+    def test_pixel_aspect(self):
+        self.assert_same_framing(64, 48, pixel_aspect=(1, 2))
+
+
+if __name__ == "__main__":
+    result = unittest.main(argv=[sys.argv[0]], exit=False).result
+    sys.exit(not result.wasSuccessful())